@@ -6,9 +6,21 @@ from flask import Flask
 from flask.logging import default_handler
 from flask_cors import CORS
 
+from .breaker import CircuitBreaker
+from .cache import ResultCache
+from .clientpool import ClientPool
+from .compress import PAYLOADS
+from .diskcache import DiskCache
+from .etag import ETAGS
 from .config import DefaultConfig
-from .gfhttpva import gfhttpva, TIMEZONE
+from .downsample import METHODS
+from .encoder import JSONProvider
+from .gfhttpva import gfhttpva, query, TIMEZONE
+from .prewarm import PREWARMER
 from .pvaapi import pvaapi
+from .reqlog import REQUEST_LOG, start_listener, stop_listener
+from .searchindex import MODES, SearchIndex
+from .segment import SegmentStore
 
 
 def create_app(config_obj="gfhttpva.config.DefaultConfig"):
@@ -27,9 +39,11 @@ def create_app(config_obj="gfhttpva.config.DefaultConfig"):
     if "GFHTTPVA_CONFIG" in os.environ:
         app.config.from_envvar('GFHTTPVA_CONFIG')
 
-    app.logger.addHandler(default_handler)
+    app.json = JSONProvider(app)
+    app.json.fast = app.config["JSON_FAST_ENCODER"]
 
     # settings for rotations handler
+    handlers = [default_handler]
     log_path = app.config["LOG_PATH"]
     log_byte = app.config["LOG_MAXBYTE"]
     log_count = app.config["LOG_COUNT"]
@@ -39,7 +53,27 @@ def create_app(config_obj="gfhttpva.config.DefaultConfig"):
         fmt = Formatter('[%(asctime)s] %(levelname)s in '
                         '%(module)s: %(message)s')
         rhandler.setFormatter(fmt)
-        app.logger.addHandler(rhandler)
+        handlers.append(rhandler)
+
+    # log records are written in background not to block requests
+    if app.config["LOG_ASYNC"]:
+        app.logger.removeHandler(default_handler)
+        start_listener(app.logger, handlers, app.config["LOG_QUEUE_SIZE"])
+    else:
+        stop_listener(app.logger)
+        for handler in handlers:
+            app.logger.addHandler(handler)
+
+    REQUEST_LOG.rate = app.config["LOG_REQUEST_SAMPLE"]
+    REQUEST_LOG.route_rates = dict(app.config["LOG_REQUEST_ROUTE_SAMPLE"])
+    REQUEST_LOG.max_body = app.config["LOG_BODY_MAX"]
+
+    PAYLOADS.clear()
+    PAYLOADS.maxbytes = app.config["COMPRESS_CACHE_SIZE"]
+    ETAGS.clear()
+    ETAGS.maxsize = app.config["ETAG_CACHE_SIZE"]
+    ETAGS.ttl = app.config["ETAG_TTL"]
+    ETAGS.lag = app.config["ETAG_LAG"]
 
     # settings for timezone
     tz = app.config["TIMEZONE"]
@@ -51,6 +85,66 @@ def create_app(config_obj="gfhttpva.config.DefaultConfig"):
 
     # settings for pvAccess
     pvaapi.timeout = app.config["PVA_RPC_TIMEOUT"]
+    pvaapi.max_workers = app.config["PVA_MAX_WORKERS"]
+    pvaapi.split_window = app.config["PVA_SPLIT_WINDOW"]
+    pvaapi.clients.clear()
+    pvaapi.clients = ClientPool(app.config["PVA_CLIENT_CHANNELS"],
+                                app.config["PVA_CLIENTS_PER_CHANNEL"],
+                                app.config["PVA_CLIENT_IDLE_TIMEOUT"])
+    pvaapi.breaker = CircuitBreaker(app.config["PVA_BREAKER_THRESHOLD"],
+                                    app.config["PVA_BREAKER_RESET"],
+                                    app.config["PVA_BREAKER_PROBES"],
+                                    app.config["PVA_BREAKER_CHANNELS"])
+
+    downsample = app.config["PVA_DOWNSAMPLE"]
+    if downsample and downsample not in METHODS:
+        app.logger.error("Specified PVA_DOWNSAMPLE is invalid. "
+                         "Disable downsampling.")
+        downsample = None
+    pvaapi.downsample = downsample
+
+    shared = DiskCache(app.config["PVA_SHARED_CACHE_PATH"],
+                       app.config["PVA_SHARED_CACHE_SIZE"])
+    pvaapi.cache = ResultCache(app.config["PVA_CACHE_SIZE"],
+                               app.config["PVA_CACHE_TTL"],
+                               app.config["PVA_CACHE_CHANNEL_TTL"],
+                               shared if shared.enabled() else None)
+    pvaapi.disk = DiskCache(app.config["PVA_DISK_CACHE_PATH"],
+                            app.config["PVA_DISK_CACHE_SIZE"],
+                            app.config["PVA_SEGMENT_LAG"])
+    pvaapi.segments = SegmentStore(app.config["PVA_SEGMENT_SIZE"],
+                                   app.config["PVA_SEGMENT_POINTS"],
+                                   app.config["PVA_SEGMENT_LAG"],
+                                   pvaapi.disk if pvaapi.disk.enabled()
+                                   else None,
+                                   app.config["PVA_DISK_CACHE_FILES"])
+
+    search_mode = app.config["PVA_SEARCH_INDEX"]
+    if search_mode and search_mode not in MODES:
+        app.logger.error("Specified PVA_SEARCH_INDEX is invalid. "
+                         "Disable search index.")
+        search_mode = None
+    pvaapi.search_index.stop()
+    pvaapi.search_index = SearchIndex(pvaapi.search_all, search_mode,
+                                      app.config["PVA_SEARCH_REFRESH"],
+                                      app.config["PVA_SEARCH_EXPIRE"], app)
+
+    # settings for pre-warming caches with dashboard queries
+    PREWARMER.stop()
+    PREWARMER.query = query
+    prewarm_path = app.config["PREWARM_PATH"]
+    if prewarm_path and not pvaapi.segments.maxsize:
+        # results of relative time ranges are found only by time range
+        # in the segment store, the disk cache keeps only ended ranges
+        # without it
+        app.logger.warning("PREWARM_PATH requires PVA_SEGMENT_SIZE. "
+                           "Disable pre-warming.")
+        prewarm_path = None
+    PREWARMER.path = prewarm_path
+    PREWARMER.interval = app.config["PREWARM_INTERVAL"]
+    PREWARMER.datasources = dict(app.config["PREWARM_DATASOURCES"])
+    PREWARMER.app = app
+    PREWARMER.start()
 
     app.register_blueprint(gfhttpva)
 
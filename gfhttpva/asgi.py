@@ -0,0 +1,195 @@
+import io
+import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from . import create_app
+
+
+def create_asgi_app(config_obj="gfhttpva.config.DefaultConfig"):
+    """Create app for ASGI server
+
+    The app serves the Flask application on an asyncio event loop, e.g.
+    ``uvicorn --factory gfhttpva.asgi:create_asgi_app``.
+
+    Parameters
+    ----------
+    config_obj: str
+        the python path to the config object
+        (e.g. gfhttpva.config.DefaultConfig)
+
+    Returns
+    -------
+    AsgiApp
+        ASGI application
+    """
+
+    return AsgiApp(create_app(config_obj))
+
+
+class AsgiApp(object):
+    """
+    ASGI adapter of gfhttpva Flask application
+
+    Requests are received on the event loop and passed to the WSGI
+    interface of the Flask application in a thread pool, so CORS, ETag,
+    compression, metrics and Server-Timing are handled by the same code
+    as under a WSGI server.
+
+    pvAccess RPC has no asynchronous API, so a request still holds a
+    worker thread while it waits for its RPCs, and at most
+    ASGI_MAX_WORKERS requests are processed concurrently as with a
+    threaded WSGI server. Only receiving requests and sending responses
+    run on the event loop, so slow clients and idle connections do not
+    hold a thread.
+
+    Attributes
+    ----------
+    app : flask.Flask
+        Flask application
+    executor : concurrent.futures.ThreadPoolExecutor
+        executor to run the Flask application
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(app.config["ASGI_MAX_WORKERS"],
+                                           thread_name_prefix="gfhttpva-asgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        environ = self._environ(scope, body)
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, result = await loop.run_in_executor(
+                self.executor, self._run, environ)
+        except Exception:
+            self.app.logger.exception("Exception on %s [%s]"
+                                      % (scope["path"], scope["method"]))
+            body = b"Internal Server Error"
+            await send({"type": "http.response.start", "status": 500,
+                        "headers": [(b"content-type", b"text/plain"),
+                                    (b"content-length",
+                                     str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        await send({"type": "http.response.start", "status": status,
+                    "headers": headers})
+
+        # streamed chunks are serialized in the executor not to block
+        # the loop
+        chunks = iter(result)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next,
+                                                   chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body",
+                                "body": chunk, "more_body": True})
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        await send({"type": "http.response.body", "body": b""})
+
+    def _run(self, environ):
+        """Call the Flask application in worker thread
+
+        Parameters
+        ----------
+        environ : dict
+            WSGI environment of request
+
+        Returns
+        -------
+        tuple
+            status code, response headers and iterable of response body
+        """
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(key.lower().encode("latin-1"),
+                                   val.encode("latin-1"))
+                                  for key, val in headers]
+
+        result = self.app(environ, start_response)
+        return started["status"], started["headers"], result
+
+    def _environ(self, scope, body):
+        """Create WSGI environment from ASGI connection scope
+
+        Parameters
+        ----------
+        scope : dict
+            ASGI connection scope
+        body : bytes
+            request body
+
+        Returns
+        -------
+        dict
+            WSGI environment of request
+        """
+
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode().decode(
+                "latin-1"),
+            "PATH_INFO": scope["path"].encode().decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+            "REMOTE_ADDR": client[0],
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+
+        for key, val in scope["headers"]:
+            name = key.decode("latin-1").upper().replace("-", "_")
+            val = val.decode("latin-1")
+            if name == "CONTENT_LENGTH":
+                continue
+            if name != "CONTENT_TYPE":
+                name = "HTTP_" + name
+            if name in environ:
+                val = environ[name] + "," + val
+            environ[name] = val
+
+        return environ
@@ -0,0 +1,210 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class _State(object):
+    """
+    Circuit state of one channel
+
+    Attributes
+    ----------
+    state : str
+        CLOSED, OPEN or HALF_OPEN
+    failures : int
+        number of consecutive failures
+    opened_at : float
+        time when the circuit was opened by time.monotonic
+    probes : int
+        number of probe calls in flight while half-open
+    """
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.probes = 0
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker for pvAccess RPC channels
+
+    The circuit of a channel opens after threshold consecutive failures
+    and calls fail fast while it is open. After reset_timeout seconds it
+    becomes half-open and lets up to probes calls through. The circuit
+    closes if a probe call succeeds and opens again if it fails.
+
+    Attributes
+    ----------
+    threshold : int
+        number of consecutive failures to open the circuit,
+        0 disables the breaker
+    reset_timeout : float
+        time in seconds to keep the circuit open
+    probes : int
+        maximum number of concurrent probe calls while half-open
+    maxsize : int
+        maximum number of channels with failures to keep the state,
+        0 means unlimited
+    _states : collections.OrderedDict
+        _State for channel name in LRU order of failures
+    _lock : threading.Lock
+        lock for _states
+    """
+
+    def __init__(self, threshold=0, reset_timeout=30, probes=1,
+                 maxsize=1000):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.maxsize = maxsize
+        self._states = OrderedDict()
+        self._lock = Lock()
+
+    def state(self, name):
+        """Get circuit state of channel
+
+        Parameters
+        ----------
+        name : str
+            channel name
+
+        Returns
+        -------
+        str
+            CLOSED, OPEN or HALF_OPEN
+        """
+
+        with self._lock:
+            state = self._states.get(name)
+            return state.state if state else CLOSED
+
+    def retry_after(self, name):
+        """Get time until the circuit of channel becomes half-open
+
+        Parameters
+        ----------
+        name : str
+            channel name
+
+        Returns
+        -------
+        float
+            time in seconds, 0 if the circuit is not open
+        """
+
+        with self._lock:
+            state = self._states.get(name)
+            if state is None or state.state != OPEN:
+                return 0
+            elapsed = time.monotonic() - state.opened_at
+            return max(self.reset_timeout - elapsed, 0)
+
+    def allow(self, name):
+        """Check whether a call to channel is allowed
+
+        Allowed calls must be reported with success, failure or cancel.
+
+        Parameters
+        ----------
+        name : str
+            channel name
+
+        Returns
+        -------
+        bool
+            whether the call is allowed or not
+        """
+
+        if not self.threshold:
+            return True
+
+        with self._lock:
+            state = self._states.get(name)
+            if state is None or state.state == CLOSED:
+                return True
+
+            if state.state == OPEN:
+                elapsed = time.monotonic() - state.opened_at
+                if elapsed < self.reset_timeout:
+                    return False
+                state.state = HALF_OPEN
+                state.probes = 0
+
+            if state.probes >= self.probes:
+                return False
+            state.probes += 1
+            return True
+
+    def success(self, name):
+        """Report a successful call to channel
+
+        Parameters
+        ----------
+        name : str
+            channel name
+        """
+
+        if not self.threshold:
+            return
+
+        with self._lock:
+            # closed channels without failures are not stored
+            self._states.pop(name, None)
+
+    def failure(self, name):
+        """Report a failed call to channel
+
+        Parameters
+        ----------
+        name : str
+            channel name
+        """
+
+        if not self.threshold:
+            return
+
+        with self._lock:
+            state = self._states.get(name)
+            if state is None:
+                state = self._states[name] = _State()
+                # channel names come from requests, so the state of the
+                # least recently failed channels is dropped
+                if self.maxsize and len(self._states) > self.maxsize:
+                    self._states.popitem(last=False)
+            self._states.move_to_end(name)
+            if state.state == HALF_OPEN:
+                state.probes -= 1
+                self._open(state)
+            elif state.state == CLOSED:
+                state.failures += 1
+                if state.failures >= self.threshold:
+                    self._open(state)
+
+    def cancel(self, name):
+        """Report an allowed call to channel which was not made
+
+        Parameters
+        ----------
+        name : str
+            channel name
+        """
+
+        if not self.threshold:
+            return
+
+        with self._lock:
+            state = self._states.get(name)
+            if state is not None and state.state == HALF_OPEN:
+                state.probes -= 1
+
+    def _open(self, state):
+        state.state = OPEN
+        state.opened_at = time.monotonic()
+        state.probes = 0
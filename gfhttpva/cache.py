@@ -0,0 +1,225 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from .diskcache import pack, unpack
+
+
+def fingerprint(kind, ch_name, entity, params, starttime, endtime,
+                labels, nturi):
+    """Create canonical key of pvAccess RPC query
+
+    Parameters
+    ----------
+    kind : str
+        kind of query result
+    ch_name : str or unicode
+        channel name of pvAccess RPC
+    entity : str or unicode
+        query entity
+    params : dict
+        parameters for optional RPC request query
+    starttime : str or unicode
+        start time as string
+    endtime : str or unicode
+        end time as string
+    labels : dict
+        labels for entity, starttime and endtime
+    nturi : bool
+        whether create request as nturi style or not
+
+    Returns
+    -------
+    tuple
+        hashable key of query
+    """
+
+    params = tuple(sorted((str(key), str(val))
+                          for key, val in params.items()))
+    labels = (str(labels["entity"]), str(labels["start"]),
+              str(labels["end"]))
+
+    return (str(kind), str(ch_name), str(entity), params, labels,
+            bool(nturi), str(starttime), str(endtime))
+
+
+class ResultCache(object):
+    """
+    Size-bounded LRU cache of query results with TTL per channel
+
+    Attributes
+    ----------
+    maxsize : int
+        maximum number of cached results, 0 disables the cache
+    ttl : float
+        default time to live of cached results in seconds
+    channel_ttl : dict
+        time to live of cached results in seconds for ch name
+    hits : int
+        number of cache hits
+    misses : int
+        number of cache misses
+    shared : diskcache.DiskCache or None
+        cache shared with other processes on the same host, e.g. in
+        /dev/shm, where results are stored as memory-mapped arrays
+    _data : collections.OrderedDict
+        pair of expiration time and result for key in LRU order
+    _lock : threading.Lock
+        lock for _data and counters
+    """
+
+    def __init__(self, maxsize=0, ttl=10, channel_ttl=None, shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.channel_ttl = dict(channel_ttl or {})
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_ttl(self, ch_name):
+        """Get time to live for channel
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+
+        Returns
+        -------
+        float
+            time to live in seconds
+        """
+
+        return self.channel_ttl.get(str(ch_name), self.ttl)
+
+    def get(self, key):
+        """Get cached result
+
+        Parameters
+        ----------
+        key : tuple
+            key created by fingerprint
+
+        Returns
+        -------
+        obj
+            cached result or None if it is not cached or expired
+        """
+
+        if not self.maxsize and self.shared is None:
+            return None
+
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] < time.monotonic():
+                del self._data[key]
+                item = None
+
+            if item is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+
+        item = self._get_shared(key)
+
+        with self._lock:
+            if item is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if self.maxsize:
+                self._store(key, item)
+
+        return item[1]
+
+    def put(self, key, ch_name, result):
+        """Store result to the cache
+
+        Parameters
+        ----------
+        key : tuple
+            key created by fingerprint
+        ch_name : str or unicode
+            channel name of pvAccess RPC to decide time to live
+        result : obj
+            result to be cached
+        """
+
+        ttl = self.get_ttl(ch_name)
+        if ttl <= 0:
+            return
+
+        if self.maxsize:
+            with self._lock:
+                self._store(key, (time.monotonic() + ttl, result))
+
+        if self.shared is not None:
+            self._put_shared(key, ttl, result)
+
+    def clear(self):
+        """Clear cached results and counters"""
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _store(self, key, item):
+        self._data[key] = item
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _get_shared(self, key):
+        """Get result stored by any process from the shared cache
+
+        Parameters
+        ----------
+        key : tuple
+            key created by fingerprint
+
+        Returns
+        -------
+        tuple
+            pair of expiration time by time.monotonic and result or None
+        """
+
+        if self.shared is None:
+            return None
+
+        for _, _, arrays, meta in self.shared.get(key):
+            remaining = meta["expires"] - time.time()
+            if remaining <= 0:
+                self.shared.remove(key)
+                return None
+            return (time.monotonic() + remaining,
+                    unpack(meta["tree"], arrays))
+        return None
+
+    def _put_shared(self, key, ttl, result):
+        """Store result to the shared cache
+
+        Parameters
+        ----------
+        key : tuple
+            key created by fingerprint
+        ttl : float
+            time to live in seconds
+        result : obj
+            result to be cached
+        """
+
+        try:
+            tree, arrays = pack(result)
+        except TypeError:
+            # results with object arrays are kept in this process only
+            return
+
+        meta = {"tree": tree, "expires": time.time() + ttl}
+        self.shared.put(key, 0, 0, arrays, meta)
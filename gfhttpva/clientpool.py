@@ -0,0 +1,292 @@
+import time
+from collections import OrderedDict
+from threading import Condition, Lock
+
+import pvaccess as pva
+
+from .metrics import OTHER, RPC_CLIENTS, remove_channel
+
+
+class _Channel(object):
+    """
+    Clients of one channel
+
+    Attributes
+    ----------
+    idle : list of tuple
+        idle clients and the time they were returned, most recent last
+    size : int
+        number of live clients including clients in use
+    closed : bool
+        whether the channel has been evicted from the pool
+    cond : threading.Condition
+        condition to wait for idle clients
+    """
+
+    def __init__(self):
+        self.idle = []
+        self.size = 0
+        self.closed = False
+        self.cond = Condition()
+
+    def in_use(self):
+        return self.size - len(self.idle)
+
+
+class ClientPool(object):
+    """
+    Bounded pool of pvAccess RPC clients for channel names
+
+    pvaccess.RpcClient can not invoke concurrently, so a client is taken
+    out of the pool with checkout and must be returned with checkin
+    after use. Each channel has its own lock, so creating a client for
+    one channel does not block the other channels.
+
+    Attributes
+    ----------
+    maxsize : int
+        maximum number of channels, 0 means unlimited. Least recently
+        used channels without clients in use are evicted
+    per_channel : int
+        maximum number of clients for one channel, 0 means unlimited
+    idle_timeout : float
+        time in seconds after which idle clients are closed,
+        0 means never
+    factory : callable
+        function to create a client for channel name
+    _channels : collections.OrderedDict
+        _Channel for channel name in LRU order
+    _lock : threading.Lock
+        lock for _channels
+    _last_sweep : float
+        time of the last sweep of idle clients
+    """
+
+    def __init__(self, maxsize=0, per_channel=4, idle_timeout=0,
+                 factory=None):
+        self.maxsize = maxsize
+        self.per_channel = per_channel
+        self.idle_timeout = idle_timeout
+        self.factory = factory or pva.RpcClient
+        self._channels = OrderedDict()
+        self._lock = Lock()
+        self._last_sweep = time.monotonic()
+
+    def __len__(self):
+        return len(self._channels)
+
+    def label(self, name):
+        """Get metric label of channel
+
+        Only channels in the pool are labeled with their names, so the
+        number of metric series is bounded by maxsize.
+
+        Parameters
+        ----------
+        name : str
+            channel name
+
+        Returns
+        -------
+        str
+            channel name or metrics.OTHER if channel is not in the pool
+        """
+
+        with self._lock:
+            return name if name in self._channels else OTHER
+
+    def size(self, name=None):
+        """Get number of live clients
+
+        Parameters
+        ----------
+        name : str, optional
+            channel name or None for all channels (default is None)
+
+        Returns
+        -------
+        int
+            number of live clients
+        """
+
+        with self._lock:
+            if name is not None:
+                channel = self._channels.get(name)
+                return channel.size if channel else 0
+            return sum(channel.size for channel in self._channels.values())
+
+    def checkout(self, name, timeout=None):
+        """Take a client for channel out of the pool
+
+        A new client is created if no client is idle and the channel has
+        less than per_channel clients, otherwise it waits for a client
+        to be returned.
+
+        Parameters
+        ----------
+        name : str
+            channel name
+        timeout : float, optional
+            timeout in seconds to wait for a client (default is None)
+
+        Returns
+        -------
+        pvaccess.RpcClient
+            client for channel or None if timed out
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            channel = self._get_channel(name)
+            with channel.cond:
+                while not channel.closed:
+                    self._expire(name, channel)
+                    if channel.idle:
+                        return channel.idle.pop()[0]
+                    full = (self.per_channel and
+                            channel.size >= self.per_channel)
+                    if not full:
+                        channel.size += 1
+                        break
+
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return None
+                    channel.cond.wait(remaining)
+                else:
+                    # evicted while waiting, then retry with new channel
+                    continue
+
+            try:
+                client = self.factory(name)
+            except Exception:
+                with channel.cond:
+                    channel.size -= 1
+                    channel.cond.notify()
+                raise
+
+            with channel.cond:
+                if not channel.closed:
+                    RPC_CLIENTS.inc((name,))
+            return client
+
+    def checkin(self, name, client):
+        """Return a client taken by checkout to the pool
+
+        Parameters
+        ----------
+        name : str
+            channel name
+        client : pvaccess.RpcClient
+            client taken by checkout
+        """
+
+        with self._lock:
+            channel = self._channels.get(name)
+
+        # metrics of evicted channels have been removed
+        if channel is None:
+            return
+
+        with channel.cond:
+            if channel.closed:
+                return
+            channel.idle.append((client, time.monotonic()))
+            channel.cond.notify()
+
+    def discard(self, name, client):
+        """Close a client taken by checkout instead of returning it
+
+        Parameters
+        ----------
+        name : str
+            channel name
+        client : pvaccess.RpcClient
+            client taken by checkout
+        """
+
+        with self._lock:
+            channel = self._channels.get(name)
+
+        if channel is None:
+            return
+
+        with channel.cond:
+            if not channel.closed:
+                channel.size -= 1
+                RPC_CLIENTS.dec((name,))
+                channel.cond.notify()
+
+    def clear(self):
+        """Close all idle clients and forget all channels"""
+
+        with self._lock:
+            channels = list(self._channels.items())
+            self._channels.clear()
+
+        for name, channel in channels:
+            self._close(name, channel)
+
+    def _get_channel(self, name):
+        with self._lock:
+            channel = self._channels.get(name)
+            if channel is None:
+                channel = self._channels[name] = _Channel()
+            self._channels.move_to_end(name)
+
+            evicted = []
+            if self.maxsize and len(self._channels) > self.maxsize:
+                for old_name, old in list(self._channels.items())[:-1]:
+                    if len(self._channels) <= self.maxsize:
+                        break
+                    if self._evictable(old):
+                        del self._channels[old_name]
+                        evicted.append((old_name, old))
+
+            now = time.monotonic()
+            sweep = now - self._last_sweep > self.idle_timeout
+            if self.idle_timeout and sweep:
+                self._last_sweep = now
+                for old_name, old in list(self._channels.items())[:-1]:
+                    with old.cond:
+                        self._expire(old_name, old)
+                    if self._evictable(old) and old.size == 0:
+                        del self._channels[old_name]
+                        evicted.append((old_name, old))
+
+        for old_name, old in evicted:
+            self._close(old_name, old)
+
+        return channel
+
+    def _evictable(self, channel):
+        # lock is not waited not to block the other channels
+        if not channel.cond.acquire(blocking=False):
+            return False
+        try:
+            return channel.in_use() == 0
+        finally:
+            channel.cond.release()
+
+    def _expire(self, name, channel):
+        if not self.idle_timeout:
+            return
+
+        expiry = time.monotonic() - self.idle_timeout
+        expired = [item for item in channel.idle if item[1] < expiry]
+        if expired:
+            channel.idle = [item for item in channel.idle
+                            if item[1] >= expiry]
+            channel.size -= len(expired)
+            RPC_CLIENTS.dec((name,), len(expired))
+
+    def _close(self, name, channel):
+        with channel.cond:
+            channel.closed = True
+            channel.size -= len(channel.idle)
+            channel.idle = []
+            channel.cond.notify_all()
+        remove_channel(name)
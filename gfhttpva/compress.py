@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def available(encoding):
+    """Check whether content encoding is available
+
+    Parameters
+    ----------
+    encoding : str
+        content encoding ("br" or "gzip")
+
+    Returns
+    -------
+    bool
+        whether the encoding is available or not
+    """
+
+    if encoding == "br":
+        return brotli is not None
+    return encoding == "gzip"
+
+
+def choose_encoding(accept_encoding, encodings):
+    """Choose content encoding accepted by client
+
+    Parameters
+    ----------
+    accept_encoding : str
+        Accept-Encoding header of request
+    encodings : list of str
+        available content encodings in order of preference
+
+    Returns
+    -------
+    str
+        content encoding or None if no encoding is accepted
+    """
+
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, val = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level):
+    """Compress data with content encoding
+
+    Parameters
+    ----------
+    data : bytes
+        data to compress
+    encoding : str
+        content encoding ("br" or "gzip")
+    level : int
+        compression level (brotli quality for "br")
+
+    Returns
+    -------
+    bytes
+        compressed data
+    """
+
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding, level):
+    """Compress chunks of streamed response with content encoding
+
+    Parameters
+    ----------
+    chunks : iterable of bytes or str
+        chunks of response
+    encoding : str
+        content encoding ("br" or "gzip")
+    level : int
+        compression level (brotli quality for "br")
+
+    Yields
+    ------
+    bytes
+        compressed chunk
+    """
+
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class PayloadCache(object):
+    """
+    Size-bounded LRU cache of compressed payloads
+
+    Payloads are keyed by the digest of the uncompressed data, so the
+    same response to a repeated query is compressed once.
+
+    Attributes
+    ----------
+    maxbytes : int
+        maximum total size of compressed payloads, 0 disables the cache
+    hits : int
+        number of cache hits
+    misses : int
+        number of cache misses
+    _data : collections.OrderedDict
+        compressed payload for key in LRU order
+    _size : int
+        total size of compressed payloads
+    _lock : threading.Lock
+        lock for _data and counters
+    """
+
+    def __init__(self, maxbytes=0):
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def compress(self, data, encoding, level):
+        """Compress data or get its cached compressed payload
+
+        Parameters
+        ----------
+        data : bytes
+            data to compress
+        encoding : str
+            content encoding ("br" or "gzip")
+        level : int
+            compression level (brotli quality for "br")
+
+        Returns
+        -------
+        bytes
+            compressed data
+        """
+
+        if not self.maxbytes:
+            return compress(data, encoding, level)
+
+        key = (encoding, level, hashlib.blake2b(data).digest())
+        with self._lock:
+            payload = self._data.get(key)
+            if payload is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return payload
+            self.misses += 1
+
+        payload = compress(data, encoding, level)
+        if len(payload) > self.maxbytes:
+            return payload
+
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = payload
+                self._size += len(payload)
+            while self._size > self.maxbytes:
+                _, old = self._data.popitem(last=False)
+                self._size -= len(old)
+
+        return payload
+
+    def clear(self):
+        """Clear cached payloads and counters"""
+
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+PAYLOADS = PayloadCache()
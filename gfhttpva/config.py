@@ -6,8 +6,54 @@ class DefaultConfig(object):
     LOG_PATH = None
     LOG_MAXBYTE = 80000
     LOG_COUNT = 1
+    LOG_ASYNC = True
+    LOG_QUEUE_SIZE = 10000
+    LOG_REQUEST_SAMPLE = 1.0
+    LOG_REQUEST_ROUTE_SAMPLE = {}
+    LOG_BODY_MAX = 4096
+    JSON_FAST_ENCODER = True
+    TABLE_STREAM_BATCH = 0
+    COMPRESS_ENCODINGS = ["br", "gzip"]
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    COMPRESS_BR_QUALITY = 4
+    COMPRESS_CACHE_SIZE = 0
+    ETAG = True
+    ETAG_CACHE_SIZE = 1024
+    ETAG_TTL = 3600
+    ETAG_LAG = 10
+    ASGI_MAX_WORKERS = 32
+    SERVER_TIMING = True
+    SERVER_TIMING_LOG = False
     TIMEZONE = "Asia/Tokyo"
     PVA_RPC_TIMEOUT = 5
+    PVA_MAX_WORKERS = 8
+    PVA_SPLIT_WINDOW = 0
+    PVA_CLIENT_CHANNELS = 100
+    PVA_CLIENTS_PER_CHANNEL = 4
+    PVA_CLIENT_IDLE_TIMEOUT = 300
+    PVA_BREAKER_THRESHOLD = 5
+    PVA_BREAKER_RESET = 30
+    PVA_BREAKER_PROBES = 1
+    PVA_BREAKER_CHANNELS = 1000
+    PVA_DOWNSAMPLE = None
+    PVA_CACHE_SIZE = 0
+    PVA_CACHE_TTL = 10
+    PVA_CACHE_CHANNEL_TTL = {}
+    PVA_SHARED_CACHE_PATH = None
+    PVA_SHARED_CACHE_SIZE = 1 << 28
+    PVA_SEGMENT_SIZE = 0
+    PVA_SEGMENT_POINTS = 1000000
+    PVA_SEGMENT_LAG = 10
+    PVA_DISK_CACHE_PATH = None
+    PVA_DISK_CACHE_SIZE = 1 << 30
+    PVA_DISK_CACHE_FILES = 16
+    PVA_SEARCH_INDEX = None
+    PVA_SEARCH_REFRESH = 300
+    PVA_SEARCH_EXPIRE = 3600
+    PREWARM_PATH = None
+    PREWARM_INTERVAL = 300
+    PREWARM_DATASOURCES = {}
 
 
 class TestingConfig(DefaultConfig):
@@ -16,4 +62,5 @@ class TestingConfig(DefaultConfig):
     """
 
     TESTING = True
+    LOG_ASYNC = False
     PVA_RPC_TIMEOUT = 1
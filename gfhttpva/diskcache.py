@@ -0,0 +1,576 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+from numpy.lib import format as npy
+
+
+SUFFIX = ".seg"
+# age in seconds after which temporary files are left by interrupted
+# writes, younger ones may be being written by other processes
+TMP_EXPIRE = 600
+
+
+def _write(path, arrays, meta):
+    """Write metadata and arrays to segment file atomically
+
+    The file is a sequence of npy arrays, a uint8 array of JSON metadata
+    followed by the column arrays, written to a temporary file and
+    renamed.
+
+    Parameters
+    ----------
+    path : str
+        path of segment file
+    arrays : list of numpy.ndarray
+        fixed-width column arrays
+    meta : dict
+        metadata of segment
+    """
+
+    meta = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for array in [meta] + arrays:
+                npy.write_array(f, np.ascontiguousarray(array),
+                                allow_pickle=False)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _read(path):
+    """Read segment file with column arrays memory-mapped
+
+    Parameters
+    ----------
+    path : str
+        path of segment file
+
+    Returns
+    -------
+    tuple
+        metadata dict and list of read-only column arrays
+    """
+
+    arrays = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        while f.tell() < size:
+            version = npy.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = npy.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = npy.read_array_header_2_0(f)
+            offset = f.tell()
+            count = int(np.prod(shape))
+            if count:
+                array = np.memmap(path, dtype=dtype, mode="r", offset=offset,
+                                  shape=shape, order="F" if fortran else "C")
+            else:
+                array = np.empty(shape, dtype=dtype)
+            arrays.append(array)
+            f.seek(offset + count * dtype.itemsize)
+
+    meta = json.loads(arrays[0].tobytes().decode())
+    return meta, arrays[1:]
+
+
+def _encode_strings(values):
+    """Encode string column to variable-length arrays
+
+    Parameters
+    ----------
+    values : list or numpy.ndarray
+        str or bytes values
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        int64 offsets of values in data and uint8 data
+    """
+
+    data = [value.encode() if isinstance(value, str) else bytes(value)
+            for value in values]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in data], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(data), dtype=np.uint8)
+
+
+def _decode_strings(offsets, data, kind):
+    """Decode string column encoded by _encode_strings
+
+    Parameters
+    ----------
+    offsets : numpy.ndarray
+        offsets of values in data
+    data : numpy.ndarray
+        encoded values
+    kind : str
+        "U" for str values or "S" for bytes values
+
+    Returns
+    -------
+    list
+        str or bytes values
+    """
+
+    data = data.tobytes()
+    bounds = offsets.tolist()
+    values = [data[lo:hi] for lo, hi in zip(bounds, bounds[1:])]
+    if kind == "U":
+        values = [value.decode() for value in values]
+    return values
+
+
+def _columns(arrays, strings):
+    """Decode string columns of arrays read from segment file
+
+    Parameters
+    ----------
+    arrays : list of numpy.ndarray
+        arrays read from segment file
+    strings : list of list
+        [column index, kind] of string columns
+
+    Returns
+    -------
+    list
+        column arrays or lists
+
+    Raises
+    ------
+    ValueError
+        if arrays of string column are missing or broken
+    """
+
+    kinds = dict(strings)
+    columns = []
+    i = 0
+    while i < len(arrays):
+        kind = kinds.get(len(columns))
+        if kind is None:
+            columns.append(arrays[i])
+            i += 1
+            continue
+        if i + 1 >= len(arrays):
+            raise ValueError("string column is broken")
+        columns.append(_decode_strings(arrays[i], arrays[i + 1], kind))
+        i += 2
+    return columns
+
+
+def _string_kind(values):
+    """Get kind of string column
+
+    Parameters
+    ----------
+    values : list or numpy.ndarray
+        column values
+
+    Returns
+    -------
+    str
+        "U" for str values, "S" for bytes values or None if values are
+        not strings
+    """
+
+    if isinstance(values, np.ndarray):
+        return values.dtype.kind if values.dtype.kind in "US" else None
+    if not len(values):
+        return None
+    if all(isinstance(value, str) for value in values):
+        return "U"
+    if all(isinstance(value, bytes) for value in values):
+        return "S"
+    return None
+
+
+def pack(result):
+    """Split result into JSON tree and arrays
+
+    Parameters
+    ----------
+    result : obj
+        dict of arrays and JSON values, possibly nested
+
+    Returns
+    -------
+    tuple
+        JSON tree referring arrays by index and list of arrays
+
+    Raises
+    ------
+    TypeError
+        if result has values which can not be packed
+    """
+
+    arrays = []
+
+    def encode(value):
+        if isinstance(value, dict):
+            return {"d": {str(key): encode(val)
+                          for key, val in value.items()}}
+        if isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                raise TypeError("object array can not be packed")
+            arrays.append(value)
+            return {"a": len(arrays) - 1}
+        if isinstance(value, np.generic):
+            value = value.item()
+        return {"v": value}
+
+    tree = encode(result)
+    # values which are not JSON serializable raise TypeError
+    json.dumps(tree)
+    return tree, arrays
+
+
+def unpack(tree, arrays):
+    """Rebuild result packed by pack
+
+    Parameters
+    ----------
+    tree : dict
+        JSON tree created by pack
+    arrays : list of numpy.ndarray
+        arrays created by pack
+
+    Returns
+    -------
+    obj
+        result with read-only arrays
+    """
+
+    if "d" in tree:
+        return {key: unpack(val, arrays) for key, val in tree["d"].items()}
+    if "a" in tree:
+        array = arrays[tree["a"]]
+        # string columns are decoded to list
+        if isinstance(array, np.ndarray):
+            return array.view(np.ndarray)
+        return array
+    return tree["v"]
+
+
+class DiskCache(object):
+    """
+    On-disk cache of columns for keys and time ranges
+
+    Columns of a key and time range are stored in a segment file named
+    by the range in a directory named by the digest of the key. Numeric
+    columns are memory-mapped when read, so cached results survive
+    restarts without being loaded into memory. String columns are stored
+    as UTF-8 data with offsets and decoded to list when read. Files are
+    replaced atomically and the directory listing is the index, so
+    processes on the same host can share a directory, e.g. in /dev/shm,
+    without locks.
+
+    Each process rescans the directory after writing rescan_ratio of
+    maxbytes, so files written by the other processes count towards
+    maxbytes. The total size may exceed maxbytes by up to rescan_ratio
+    of maxbytes for each process between rescans.
+
+    Attributes
+    ----------
+    path : str or None
+        cache directory, None disables the cache
+    maxbytes : int
+        maximum total size of segment files, least recently used files
+        are removed
+    lag : float
+        time in seconds before now whose datapoints may be incomplete
+    rescan_ratio : float
+        fraction of maxbytes written after which the directory is
+        rescanned
+    _files : collections.OrderedDict
+        size of segment file for path in LRU order
+    _size : int
+        total size of segment files
+    _written : int
+        size of segment files written since the last rescan
+    _lock : threading.Lock
+        lock for _files, _size and _written
+    """
+
+    rescan_ratio = 0.125
+
+    def __init__(self, path=None, maxbytes=0, lag=10):
+        self.path = path
+        self.maxbytes = maxbytes
+        self.lag = lag
+        self._files = OrderedDict()
+        self._size = 0
+        self._written = 0
+        self._lock = Lock()
+        if path:
+            self._scan()
+
+    def __len__(self):
+        return len(self._files)
+
+    def enabled(self):
+        """Check whether the cache is enabled
+
+        Returns
+        -------
+        bool
+            whether the cache is enabled or not
+        """
+
+        return bool(self.path and self.maxbytes)
+
+    def closed(self, end):
+        """Check whether datapoints before end time are final
+
+        Parameters
+        ----------
+        end : int
+            end time in milliseconds
+
+        Returns
+        -------
+        bool
+            whether the time range is closed or not
+        """
+
+        return end <= (time.time() - self.lag) * 1000
+
+    def get(self, key):
+        """Get cached segments of key
+
+        Parameters
+        ----------
+        key : tuple
+            key of cached result
+
+        Returns
+        -------
+        list of tuple
+            (start, end, column arrays or lists, metadata) sorted by
+            start
+        """
+
+        if not self.enabled():
+            return []
+
+        entries = []
+        for start, end, path in self._list(key):
+            try:
+                meta, arrays = _read(path)
+                arrays = _columns(arrays, meta.pop("strings", []))
+            except (OSError, ValueError):
+                # broken or removed by other process
+                self._remove(path)
+                continue
+            self._touch(path)
+            entries.append((start, end, arrays, meta))
+        return entries
+
+    def put(self, key, start, end, arrays, meta=None):
+        """Store columns of key for time range
+
+        Columns of objects are not stored, nor are columns larger than
+        maxbytes.
+
+        Parameters
+        ----------
+        key : tuple
+            key of cached result
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
+        arrays : list
+            column values
+        meta : dict, optional
+            metadata stored with columns (default is None)
+
+        Returns
+        -------
+        int
+            number of segment files of key or 0 if not stored
+        """
+
+        if not self.enabled():
+            return 0
+
+        columns, strings = [], []
+        for i, array in enumerate(arrays):
+            kind = _string_kind(array)
+            if kind is not None:
+                # fixed-width arrays take the width of the longest value
+                # for every value
+                strings.append([i, kind])
+                columns.extend(_encode_strings(array))
+                continue
+            array = np.asarray(array)
+            if array.dtype.hasobject or array.dtype.kind in "US":
+                return 0
+            columns.append(array)
+        if sum(column.nbytes for column in columns) > self.maxbytes:
+            return 0
+
+        directory = self._directory(key)
+        path = os.path.join(directory, "%d-%d%s" % (start, end, SUFFIX))
+        meta = dict(meta or {}, key=repr(key))
+        if strings:
+            meta["strings"] = strings
+        try:
+            os.makedirs(directory, exist_ok=True)
+            _write(path, columns, meta)
+        except OSError:
+            return 0
+
+        self._add(path, os.path.getsize(path))
+        return len(self._list(key))
+
+    def replace(self, key, segments):
+        """Replace all segments of key
+
+        Parameters
+        ----------
+        key : tuple
+            key of cached result
+        segments : list of tuple
+            (start, end, column arrays) of new segments
+        """
+
+        if not self.enabled():
+            return
+
+        old = [path for _, _, path in self._list(key)]
+        new = set()
+        for start, end, arrays in segments:
+            self.put(key, start, end, arrays)
+            new.add(os.path.join(self._directory(key),
+                                 "%d-%d%s" % (start, end, SUFFIX)))
+
+        for path in old:
+            if path not in new:
+                self._remove(path)
+
+    def remove(self, key):
+        """Remove all segments of key
+
+        Parameters
+        ----------
+        key : tuple
+            key of cached result
+        """
+
+        for _, _, path in self._list(key):
+            self._remove(path)
+
+    def clear(self):
+        """Remove all segment files"""
+
+        with self._lock:
+            paths = list(self._files)
+        for path in paths:
+            self._remove(path)
+
+    def _directory(self, key):
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16)
+        return os.path.join(self.path, digest.hexdigest())
+
+    def _list(self, key):
+        directory = self._directory(key)
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+
+        segments = []
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            try:
+                start, end = (int(t) for t in name[:-len(SUFFIX)].split("-"))
+            except ValueError:
+                continue
+            segments.append((start, end, os.path.join(directory, name)))
+        segments.sort()
+        return segments
+
+    def _scan(self):
+        files = []
+        expiry = time.time() - TMP_EXPIRE
+        for directory, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if name.endswith(".tmp"):
+                        if os.stat(path).st_mtime < expiry:
+                            # left by interrupted writes
+                            os.unlink(path)
+                    elif name.endswith(SUFFIX):
+                        stat = os.stat(path)
+                        files.append((stat.st_mtime, path, stat.st_size))
+                except OSError:
+                    continue
+
+        # files of the other processes are older than the files used by
+        # this process, which keep their LRU order
+        with self._lock:
+            merged = OrderedDict((path, size) for _, path, size
+                                 in sorted(files) if path not in self._files)
+            merged.update(self._files)
+            self._files = merged
+            self._size = sum(merged.values())
+            self._written = 0
+
+    def _touch(self, path):
+        with self._lock:
+            if path in self._files:
+                self._files.move_to_end(path)
+                return
+        # written by other process sharing the directory
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        with self._lock:
+            if path not in self._files:
+                self._files[path] = size
+                self._size += size
+
+    def _add(self, path, size):
+        with self._lock:
+            self._size += size - self._files.pop(path, 0)
+            self._files[path] = size
+            self._written += size
+            rescan = self._written > self.maxbytes * self.rescan_ratio
+
+        if rescan:
+            self._scan()
+
+        with self._lock:
+            evicted = []
+            while self._size > self.maxbytes and len(self._files) > 1:
+                old, old_size = self._files.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old)
+
+        for old in evicted:
+            self._unlink(old)
+
+    def _remove(self, path):
+        with self._lock:
+            self._size -= self._files.pop(path, 0)
+        self._unlink(path)
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            # directory is not empty or file is removed by other process
+            pass
@@ -0,0 +1,169 @@
+import numpy as np
+
+
+def lttb(time, value, threshold):
+    """Select points with Largest-Triangle-Three-Buckets algorithm
+
+    Parameters
+    ----------
+    time : numpy.ndarray
+        sorted time of points
+    value : numpy.ndarray
+        numerical value of points
+    threshold : int
+        maximum number of selected points
+
+    Returns
+    -------
+    numpy.ndarray
+        sorted indices of selected points
+    """
+
+    n = len(value)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+
+    x = np.asarray(time, dtype=np.float64)
+    y = np.asarray(value, dtype=np.float64)
+
+    # n - 2 inner points are split into threshold - 2 buckets
+    # and the last point is used as the last bucket to look ahead
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x, edges[:-1]) / counts
+    avg_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (avg_y[i + 1] - y[a]))
+        a = start + np.argmax(area)
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax(time, value, threshold):
+    """Select minimum and maximum points of each bucket
+
+    Parameters
+    ----------
+    time : numpy.ndarray
+        sorted time of points
+    value : numpy.ndarray
+        numerical value of points
+    threshold : int
+        maximum number of selected points
+
+    Returns
+    -------
+    numpy.ndarray
+        sorted indices of selected points
+    """
+
+    n = len(value)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 2:
+        return np.arange(max(threshold, 0))
+
+    buckets = threshold // 2
+
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(buckets), np.diff(edges))
+
+    # sort by bucket then value, so each bucket begins with its minimum
+    order = np.lexsort((value, bucket))
+    first = order[edges[:-1]]
+    last = order[edges[1:] - 1]
+
+    return np.unique(np.concatenate((first, last)))
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+AGGREGATIONS = ("mean", "min", "max", "last", "count")
+
+
+def downsample(method, time, value, threshold):
+    """Downsample points to threshold with method
+
+    Non-numerical values are returned as they are.
+
+    Parameters
+    ----------
+    method : str
+        name of downsampling method ("lttb" or "minmax")
+    time : numpy.ndarray
+        sorted time of points
+    value : numpy.ndarray
+        value of points
+    threshold : int
+        maximum number of points
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        downsampled time and value
+    """
+
+    value = np.asarray(value)
+    if len(value) <= threshold or not np.issubdtype(value.dtype, np.number):
+        return time, value
+
+    indices = METHODS[method](time, value, threshold)
+
+    return time[indices], value[indices]
+
+
+def aggregate(func, time, value, interval):
+    """Reduce points in each time interval with aggregation function
+
+    Points are grouped into buckets aligned to multiples of interval and
+    each bucket is reduced to one point at its start time. mean, min and
+    max of non-numerical values are returned as they are.
+
+    Parameters
+    ----------
+    func : str
+        aggregation function ("mean", "min", "max", "last" or "count")
+    time : numpy.ndarray
+        sorted int64 time of points in milliseconds
+    value : numpy.ndarray
+        value of points
+    interval : int
+        bucket width in milliseconds
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        time and value of buckets
+    """
+
+    value = np.asarray(value)
+    number = np.issubdtype(value.dtype, np.number)
+    if len(value) == 0 or (func not in ("last", "count") and not number):
+        return time, value
+
+    bucket = np.asarray(time, dtype=np.int64) // interval
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    counts = np.diff(np.append(starts, len(value)))
+    bucket_time = bucket[starts] * interval
+
+    if func == "count":
+        return bucket_time, counts
+    if func == "last":
+        return bucket_time, value[starts + counts - 1]
+    if func == "min":
+        return bucket_time, np.minimum.reduceat(value, starts)
+    if func == "max":
+        return bucket_time, np.maximum.reduceat(value, starts)
+    return bucket_time, np.add.reduceat(value, starts,
+                                        dtype=np.float64) / counts
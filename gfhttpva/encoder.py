@@ -0,0 +1,142 @@
+import json
+import time
+from json.encoder import encode_basestring_ascii as encode_str
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+from .metrics import SERIALIZE_LATENCY
+from .timing import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_COMPACT = {"separators": (",", ":")}
+
+
+def _identical(res):
+    """Check orjson output is identical to the output of json module
+
+    orjson writes NaN and Infinity as null, does not escape non-ASCII
+    characters and DEL (U+007F) and formats large or small floats with
+    exponent in its own way, such as 1e16 and 0.00001 instead of 1e+16
+    and 1e-05.
+
+    Parameters
+    ----------
+    res : bytes
+        orjson output
+
+    Returns
+    -------
+    bool
+        whether the output is identical or not
+    """
+
+    if (not res.isascii() or b"\x7f" in res or b"null" in res or
+            b"0.0000" in res):
+        return False
+
+    buf = np.frombuffer(res, dtype=np.uint8)
+    exponent = buf[1:] == ord("e")
+    if not exponent.any():
+        return True
+
+    digit = (buf[:-1] >= ord("0")) & (buf[:-1] <= ord("9"))
+    return not np.any(exponent & digit)
+
+
+class RawJSON(str):
+    """
+    JSON string which is output as is by JSONProvider
+
+    The string must be the compact JSON with sorted keys and escaped
+    non-ASCII characters. It is decoded and encoded again when the
+    provider is set to output other format.
+    """
+
+
+def _default(o):
+    """Convert numpy objects to JSON serializable objects
+
+    Parameters
+    ----------
+    o : obj
+        object which json module does not know how to serialize
+
+    Returns
+    -------
+    obj
+        JSON serializable object
+    """
+
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    return DefaultJSONProvider.default(o)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    JSON provider which serializes numpy arrays and uses orjson if any
+
+    Compact responses are serialized with orjson when it is installed
+    and fast is True. The json module is used as fallback whenever the
+    orjson output could differ from it, so the output is identical.
+    Float arrays other than float64 must be cast to float64 beforehand
+    as orjson serializes them with their own precision.
+
+    Attributes
+    ----------
+    fast : bool
+        whether use orjson for compact responses or not
+    """
+
+    default = staticmethod(_default)
+    fast = orjson is not None
+
+    def dumps(self, obj, **kwargs):
+        """Serialize data as JSON to a string
+
+        Parameters
+        ----------
+        obj : obj
+            data to serialize
+        kwargs : dict
+            arguments passed to json.dumps
+
+        Returns
+        -------
+        str
+            JSON string
+        """
+
+        start = time.perf_counter()
+        try:
+            with phase("encode"):
+                return self._dumps(obj, **kwargs)
+        finally:
+            SERIALIZE_LATENCY.observe(time.perf_counter() - start)
+
+    def _dumps(self, obj, **kwargs):
+        if isinstance(obj, RawJSON):
+            if kwargs == _COMPACT and self.sort_keys and self.ensure_ascii:
+                return str(obj)
+            obj = json.loads(obj)
+
+        if (self.fast and orjson is not None and kwargs == _COMPACT and
+                self.sort_keys and self.ensure_ascii):
+            option = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            try:
+                res = orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                res = None
+
+            if res is not None and _identical(res):
+                return res.decode()
+
+        return super().dumps(obj, **kwargs)
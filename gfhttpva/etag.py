@@ -0,0 +1,238 @@
+import calendar
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+# request keys which change on every refresh without changing the result
+VOLATILE_KEYS = ("requestId", "panelId", "dashboardId", "dashboardUID",
+                 "panelPluginId", "startTime", "scopedVars", "rangeRaw",
+                 "timezone", "app", "cacheTimeout", "queryCachingTTL")
+
+
+def request_key(path, req):
+    """Create fingerprint of request without volatile keys
+
+    Parameters
+    ----------
+    path : str
+        URL path
+    req : dict
+        request body
+
+    Returns
+    -------
+    str
+        hex digest of the canonical request
+    """
+
+    if isinstance(req, dict):
+        req = {key: val for key, val in req.items()
+               if key not in VOLATILE_KEYS}
+        if isinstance(req.get("range"), dict):
+            req["range"] = {key: val for key, val in req["range"].items()
+                            if key != "raw"}
+
+    data = json.dumps([path, req], sort_keys=True, separators=(",", ":"),
+                      default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+def make_etag(key, body):
+    """Create strong entity tag of response
+
+    Parameters
+    ----------
+    key : str
+        fingerprint of request created by request_key
+    body : bytes
+        response body
+
+    Returns
+    -------
+    str
+        entity tag without quotes
+    """
+
+    digest = hashlib.blake2b(key.encode(), digest_size=16)
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def encoded(etag, encoding):
+    """Get entity tag of response compressed with content encoding
+
+    Parameters
+    ----------
+    etag : str
+        entity tag without quotes
+    encoding : str
+        content encoding
+
+    Returns
+    -------
+    str
+        entity tag of compressed response without quotes
+    """
+
+    return "%s-%s" % (etag, encoding)
+
+
+def matches(if_none_match, etag):
+    """Check whether If-None-Match header matches entity tag
+
+    Entity tags of compressed responses match the tag of the
+    uncompressed response.
+
+    Parameters
+    ----------
+    if_none_match : str
+        If-None-Match header of request
+    etag : str
+        entity tag without quotes
+
+    Returns
+    -------
+    bool
+        whether the header matches or not
+    """
+
+    for tag in (if_none_match or "").split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == etag or tag.rsplit("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def range_end(req):
+    """Get end of time range of request
+
+    Parameters
+    ----------
+    req : dict
+        request body
+
+    Returns
+    -------
+    float
+        end time as UNIX time or None if it can not be parsed
+    """
+
+    try:
+        end = req["range"]["to"].split(".")[0]
+        end = time.strptime(end, "%Y-%m-%dT%H:%M:%S")
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+    return calendar.timegm(end)
+
+
+class ETagStore(object):
+    """
+    Size-bounded LRU store of entity tags served for closed time ranges
+
+    Results of a time range which ended more than lag seconds ago do
+    not change, so a request whose If-None-Match matches the stored tag
+    is answered without pvAccess RPC.
+
+    Attributes
+    ----------
+    maxsize : int
+        maximum number of stored tags, 0 disables the store
+    ttl : float
+        time to live of stored tags in seconds
+    lag : float
+        time in seconds before now whose datapoints may be incomplete
+    hits : int
+        number of store hits
+    _data : collections.OrderedDict
+        expiration time, entity tag and body size for key in LRU order
+    _lock : threading.Lock
+        lock for _data and counters
+    """
+
+    def __init__(self, maxsize=0, ttl=3600, lag=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lag = lag
+        self.hits = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Get entity tag served for request
+
+        Parameters
+        ----------
+        key : str
+            fingerprint of request created by request_key
+
+        Returns
+        -------
+        tuple
+            entity tag and size of uncompressed response body or None if
+            it is not stored or expired
+        """
+
+        if not self.maxsize:
+            return None
+
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1:]
+
+    def hit(self):
+        """Count a request answered with the stored entity tag"""
+
+        with self._lock:
+            self.hits += 1
+
+    def put(self, key, etag, end, size=0):
+        """Store entity tag if the time range of request is closed
+
+        Parameters
+        ----------
+        key : str
+            fingerprint of request created by request_key
+        etag : str
+            entity tag of response
+        end : float
+            end time of request as UNIX time or None
+        size : int, optional
+            size of uncompressed response body to decide whether 304
+            response has the tag of compressed response (default is 0)
+        """
+
+        if not self.maxsize or end is None or end > time.time() - self.lag:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, etag, size)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Clear stored tags and counters"""
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+
+
+ETAGS = ETagStore()
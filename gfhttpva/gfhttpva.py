@@ -1,18 +1,22 @@
+import math
+import time
 from datetime import datetime
 
 import pytz
 
-from flask import Blueprint, current_app, request, jsonify, json
+from flask import Blueprint, current_app, request, jsonify, json, g
 from flask_cors import cross_origin
 
-from .pvaapi import pvaapi
+from .downsample import AGGREGATIONS
+from .pvaapi import pvaapi, table_rows
 from .exception import InvalidRequest
-from .timezone import timezone
+from . import compress, etag, metrics, timing
+from .reqlog import REQUEST_LOG
+from .timezone import TIMEZONE
 
 
 gfhttpva = Blueprint("gfhttpva", __name__)
 methods = ("GET", "POST")
-TIMEZONE = timezone()
 
 
 def iso_to_dt(iso_str):
@@ -57,6 +61,429 @@ def iso_to_dt(iso_str):
         raise InvalidRequest("Invalid query time", status_code=400)
 
 
+def table_chunks(columns, values, batch, json_provider):
+    """Serialize table response in chunks
+
+    The joined chunks are identical to the compact JSON of the table
+    response with sorted keys.
+
+    Parameters
+    ----------
+    columns : list of dict
+        table columns
+    values : list
+        list of column values
+    batch : int
+        number of rows serialized in one chunk
+    json_provider : flask.json.provider.JSONProvider
+        JSON provider to serialize data
+
+    Yields
+    ------
+    str
+        chunk of JSON string
+    """
+
+    compact = {"separators": (",", ":")}
+    nrows = min(len(value) for value in values) if values else 0
+
+    yield '[{"columns":%s,"rows":[' % json_provider.dumps(columns, **compact)
+    for start in range(0, nrows, batch):
+        rows = table_rows(values, start, min(start + batch, nrows))
+        chunk = json_provider.dumps(rows, **compact)
+        yield ("," if start else "") + chunk[1:-1]
+    yield '],"type":"table"}]\n'
+
+
+def not_modified(key):
+    """Create 304 response if client has the result of closed range
+
+    Parameters
+    ----------
+    key : str
+        fingerprint of request created by etag.request_key
+
+    Returns
+    -------
+    flask.Response
+        304 Not Modified response or None if result must be sent
+    """
+
+    item = etag.ETAGS.get(key)
+    if item is None:
+        return None
+    tag, size = item
+    if not etag.matches(request.headers.get("If-None-Match"), tag):
+        return None
+
+    etag.ETAGS.hit()
+    response = current_app.response_class(status=304)
+    response.set_etag(tag)
+    # compress_response sets the tag of the compressed response
+    g.etag_size = size
+    return response
+
+
+def etag_response(response, key, req):
+    """Set entity tag to response and answer conditional request
+
+    Parameters
+    ----------
+    response : flask.Response
+        response of request
+    key : str
+        fingerprint of request created by etag.request_key
+    req : dict
+        request body
+
+    Returns
+    -------
+    flask.Response
+        the response with ETag or 304 Not Modified response
+    """
+
+    # streamed responses are not buffered to compute their tags
+    if response.is_streamed or response.status_code != 200:
+        return response
+
+    data = response.get_data()
+    tag = etag.make_etag(key, data)
+    etag.ETAGS.put(key, tag, etag.range_end(req), len(data))
+    if etag.matches(request.headers.get("If-None-Match"), tag):
+        response = current_app.response_class(status=304)
+        g.etag_size = len(data)
+    response.set_etag(tag)
+    return response
+
+
+def table_response(columns, values):
+    """Create table response
+
+    If TABLE_STREAM_BATCH is set, the rows are serialized in batches of
+    the size while the response is sent.
+
+    Parameters
+    ----------
+    columns : list of dict
+        table columns
+    values : list
+        list of column values
+
+    Returns
+    -------
+    flask.Response
+        json formatted table response
+    """
+
+    batch = current_app.config["TABLE_STREAM_BATCH"]
+    if not batch:
+        with timing.phase("convert"):
+            rows = table_rows(values)
+        return jsonify([{"columns": columns, "rows": rows,
+                         "type": "table"}])
+
+    json_provider = current_app.json
+    chunks = table_chunks(columns, values, batch, json_provider)
+    return current_app.response_class(chunks,
+                                      mimetype=json_provider.mimetype)
+
+
+def search(req):
+    """Find metric options with pvAccess
+
+    Parameters
+    ----------
+    req : dict
+        search request from Grafana
+
+    Returns
+    -------
+    list
+        search result
+
+    Raises
+    ------
+    InvalidRequest
+        if request parameters are missing
+    """
+
+    with timing.phase("parse"):
+        try:
+            ch_name = req["ch"]
+            entity = req["target"]
+            name = req["name"] if "name" in req else "entity"
+            nturi = req["nturi_style"]
+        except (KeyError, TypeError):
+            raise InvalidRequest("Search request invalid", status_code=400,
+                                 details={"request": req})
+
+    return pvaapi.get_search(ch_name, entity, name, nturi)
+
+
+def query(req):
+    """Get metrics with pvAccess
+
+    Parameters
+    ----------
+    req : dict
+        query request from Grafana
+
+    Returns
+    -------
+    tuple
+        "table" and (columns, values) of the table if a table target is
+        queried, otherwise "timeserie" and list of timeseries responses
+
+    Raises
+    ------
+    InvalidRequest
+        if request parameters are missing
+    """
+
+    with timing.phase("parse"):
+        try:
+            ch_name = req["jsonData"]["ch"]
+            starttime = req["range"]["from"].split(".")[0]
+            endtime = req["range"]["to"].split(".")[0]
+            targets = req["targets"]
+            labels = {"entity": req["jsonData"]["entity_label"],
+                      "start": req["jsonData"]["start_label"],
+                      "end": req["jsonData"]["end_label"]}
+            nturi = req["jsonData"]["nturi_style"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise InvalidRequest("Invalid query", status_code=400,
+                                 details={"request": req})
+
+    with timing.phase("time"):
+        starttime = iso_to_dt(starttime)
+        endtime = iso_to_dt(endtime)
+
+    max_points = req.get("maxDataPoints")
+    if max_points is not None:
+        try:
+            max_points = int(max_points)
+        except (TypeError, ValueError, OverflowError):
+            max_points = -1
+        if max_points < 0:
+            raise InvalidRequest("Invalid maxDataPoints", status_code=400,
+                                 details={"maxDataPoints":
+                                          req["maxDataPoints"]})
+
+    interval = req.get("intervalMs")
+    if not isinstance(interval, (int, float)) or not 0 < interval < math.inf:
+        interval = None
+    else:
+        # time is in milliseconds, so shorter intervals are 1 ms
+        interval = max(int(interval), 1)
+
+    # targets after the first table target are ignored as the table is
+    # returned alone, and a target without type fails the whole query
+    calls = []
+    kinds = []
+    invalid = False
+    for target in targets:
+        params = target["params"] if "params" in target else {}
+        entity = target["target"] if "target" in target else ""
+
+        try:
+            ttype = target["type"]
+        except KeyError:
+            invalid = True
+            break
+
+        args = (ch_name, entity, params, starttime, endtime, labels, nturi)
+        if ttype == "table":
+            calls.append((pvaapi.valget_table_columns, args))
+            kinds.append(("table", entity))
+            break
+
+        # aggregation is a target option which is not sent to RPC
+        aggregation = target.get("aggregation")
+        if aggregation and aggregation not in AGGREGATIONS:
+            raise InvalidRequest("Invalid aggregation", status_code=400,
+                                 details={"aggregation": aggregation})
+
+        calls.append((pvaapi.valget,
+                      args + (max_points, aggregation, interval)))
+        kinds.append(("timeserie", entity))
+
+    futures = pvaapi.map_calls(calls)
+
+    # results and errors are handled in the order of targets
+    res = []
+    for (ttype, entity), result in zip(kinds, pvaapi.results(futures)):
+        if ttype == "table":
+            return "table", result
+        res_frame = {"target": entity, "datapoints": result}
+        res.append(res_frame)
+
+    if invalid:
+        raise InvalidRequest("Invalid query", status_code=400,
+                             details={"request": req})
+
+    return "timeserie", res
+
+
+def annotations(req):
+    """Get annotations with pvAccess
+
+    Parameters
+    ----------
+    req : dict
+        annotation request from Grafana
+
+    Returns
+    -------
+    list
+        list of annotations
+
+    Raises
+    ------
+    InvalidRequest
+        if request parameters are missing
+    """
+
+    with timing.phase("parse"):
+        try:
+            ann = req["annotation"]
+            ch_name = req["jsonData"]["ch"]
+            entity = ann["entity"]
+            starttime = req["range"]["from"].split(".")[0]
+            endtime = req["range"]["to"].split(".")[0]
+            params = ann["params"] if "params" in req["annotation"] else {}
+            labels = {"entity": req["jsonData"]["entity_label"],
+                      "start": req["jsonData"]["start_label"],
+                      "end": req["jsonData"]["end_label"]}
+            nturi = req["jsonData"]["nturi_style"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise InvalidRequest("Invalid query", status_code=400,
+                                 details={"request": req})
+
+    with timing.phase("time"):
+        starttime = iso_to_dt(starttime)
+        endtime = iso_to_dt(endtime)
+
+    return pvaapi.get_annotation_json(ch_name, ann, entity, params,
+                                      starttime, endtime, labels, nturi)
+
+
+@gfhttpva.before_request
+def start_timer():
+    """Record start time of request for metrics and phase timings"""
+
+    g.start_time = time.perf_counter()
+    g.timing_token = timing.start()
+    metrics.IN_FLIGHT.inc()
+
+
+@gfhttpva.teardown_request
+def stop_timer(exc):
+    """Stop phase timings of request and count it as finished
+
+    Parameters
+    ----------
+    exc : Exception
+        unhandled exception of request if any
+    """
+
+    if "timing_token" in g:
+        timing.stop(g.timing_token)
+        metrics.IN_FLIGHT.dec()
+
+
+@gfhttpva.after_request
+def record_metrics(response):
+    """Record metrics and add phase timings of request to response
+
+    Parameters
+    ----------
+    response : flask.Response
+        response of request
+
+    Returns
+    -------
+    flask.Response
+        the response with Server-Timing header if enabled
+    """
+
+    route = request.url_rule.rule if request.url_rule else request.path
+    if route == "/metrics":
+        return response
+
+    timings = timing.current()
+    if timings is not None:
+        if current_app.config["SERVER_TIMING"]:
+            response.headers["Server-Timing"] = timings.header()
+        if current_app.config["SERVER_TIMING_LOG"]:
+            log = {"route": route, "status": response.status_code,
+                   "timings": dict(timings.items())}
+            current_app.logger.info(json.dumps(log))
+
+    metrics.REQUESTS.inc((route, response.status_code))
+    if "start_time" in g:
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - g.start_time,
+                                        (route,))
+    if response.content_length is not None:
+        metrics.RESPONSE_SIZE.observe(response.content_length, (route,))
+
+    return response
+
+
+@gfhttpva.after_request
+def compress_response(response):
+    """Compress response with content encoding accepted by client
+
+    Parameters
+    ----------
+    response : flask.Response
+        response of request
+
+    Returns
+    -------
+    flask.Response
+        the response compressed if it is large enough
+    """
+
+    config = current_app.config
+    encodings = [encoding for encoding in config["COMPRESS_ENCODINGS"]
+                 if compress.available(encoding)]
+    if not encodings or "Content-Encoding" in response.headers:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = compress.choose_encoding(
+        request.headers.get("Accept-Encoding"), encodings)
+    if encoding is None:
+        return response
+
+    if response.status_code == 304:
+        # 304 has the same tag as the response which would be sent
+        size = g.get("etag_size", 0)
+        tag, weak = response.get_etag()
+        if tag and size >= config["COMPRESS_MIN_SIZE"]:
+            response.set_etag(etag.encoded(tag, encoding), weak)
+        return response
+    if response.status_code < 200 or response.status_code == 204:
+        return response
+
+    level = config["COMPRESS_BR_QUALITY" if encoding == "br" else
+                   "COMPRESS_LEVEL"]
+    if response.is_streamed:
+        response.response = compress.compress_stream(response.response,
+                                                     encoding, level)
+    else:
+        data = response.get_data()
+        if len(data) < config["COMPRESS_MIN_SIZE"]:
+            return response
+        response.set_data(compress.PAYLOADS.compress(data, encoding, level))
+
+    response.headers["Content-Encoding"] = encoding
+    tag, weak = response.get_etag()
+    if tag:
+        response.set_etag(etag.encoded(tag, encoding), weak)
+    return response
+
+
 @gfhttpva.route("/", methods=methods)
 @cross_origin()
 def hello_world():
@@ -68,8 +495,8 @@ def hello_world():
         a test str
     """
 
-    current_app.logger.info(request.headers)
-    current_app.logger.info(request.get_json(silent=True))
+    REQUEST_LOG.log(current_app.logger, request.path, request.headers,
+                    request.get_json(silent=True))
 
     return "pvaccess python Grafana datasource"
 
@@ -90,21 +517,12 @@ def find_metrics():
         if request parameters are missing
     """
 
-    current_app.logger.info(request.headers)
-    current_app.logger.info(request.get_json())
-
-    req = request.get_json()
+    with timing.phase("parse"):
+        req = request.get_json()
 
-    try:
-        ch_name = req["ch"]
-        entity = req["target"]
-        name = req["name"] if "name" in req else "entity"
-        nturi = req["nturi_style"]
-    except KeyError:
-        raise InvalidRequest("Search request invalid", status_code=400,
-                             details={"request": req})
+    REQUEST_LOG.log(current_app.logger, request.path, request.headers, req)
 
-    res = pvaapi.get_search(ch_name, entity, name, nturi)
+    res = search(req)
 
     return jsonify(res)
 
@@ -125,46 +543,27 @@ def query_metrics():
         if request parameters are missing
     """
 
-    current_app.logger.info(request.headers)
-    current_app.logger.info(request.get_json())
+    with timing.phase("parse"):
+        req = request.get_json()
 
-    req = request.get_json()
+    REQUEST_LOG.log(current_app.logger, request.path, request.headers, req)
 
-    try:
-        ch_name = req["jsonData"]["ch"]
-        starttime = iso_to_dt(req["range"]["from"].split(".")[0])
-        endtime = iso_to_dt(req["range"]["to"].split(".")[0])
-        targets = req["targets"]
-        labels = {"entity": req["jsonData"]["entity_label"],
-                  "start": req["jsonData"]["start_label"],
-                  "end": req["jsonData"]["end_label"]}
-        nturi = req["jsonData"]["nturi_style"]
-    except (KeyError, IndexError) as e:
-        raise InvalidRequest("Invalid query", status_code=400,
-                             details={"request": req})
+    key = None
+    if current_app.config["ETAG"]:
+        key = etag.request_key(request.path, req)
+        response = not_modified(key)
+        if response is not None:
+            return response
 
-    res = []
-    for target in targets:
-        params = target["params"] if "params" in target else {}
-        entity = target["target"] if "target" in target else ""
+    ttype, res = query(req)
+    if ttype == "table":
+        response = table_response(*res)
+    else:
+        response = jsonify(res)
 
-        try:
-            ttype = target["type"]
-        except KeyError:
-            raise InvalidRequest("Invalid query", status_code=400,
-                                 details={"request": req})
-
-        if ttype == "table":
-            table = pvaapi.valget_table(ch_name, entity, params, starttime,
-                                        endtime, labels, nturi)
-            return jsonify(table)
-
-        datapoints = pvaapi.valget(ch_name, entity, params, starttime,
-                                   endtime, labels, nturi)
-        res_frame = {"target": entity, "datapoints": datapoints}
-        res.append(res_frame)
-
-    return jsonify(res)
+    if key is None:
+        return response
+    return etag_response(response, key, req)
 
 
 @gfhttpva.route("/annotations", methods=methods)
@@ -183,29 +582,37 @@ def query_annotations():
         if request parameters are missing
     """
 
-    current_app.logger.info(request.headers)
-    current_app.logger.info(request.get_json())
+    with timing.phase("parse"):
+        req = request.get_json()
 
-    req = request.get_json()
+    REQUEST_LOG.log(current_app.logger, request.path, request.headers, req)
 
-    try:
-        ann = req["annotation"]
-        ch_name = req["jsonData"]["ch"]
-        entity = ann["entity"]
-        starttime = iso_to_dt(req["range"]["from"].split(".")[0])
-        endtime = iso_to_dt(req["range"]["to"].split(".")[0])
-        params = ann["params"] if "params" in req["annotation"] else {}
-        labels = {"entity": req["jsonData"]["entity_label"],
-                  "start": req["jsonData"]["start_label"],
-                  "end": req["jsonData"]["end_label"]}
-        nturi = req["jsonData"]["nturi_style"]
-    except (KeyError, IndexError) as e:
-        raise InvalidRequest("Invalid query", status_code=400,
-                             details={"request": req})
+    key = None
+    if current_app.config["ETAG"]:
+        key = etag.request_key(request.path, req)
+        response = not_modified(key)
+        if response is not None:
+            return response
 
-    res = pvaapi.get_annotation(ch_name, ann, entity, params, starttime,
-                                endtime, labels, nturi)
-    return jsonify(res)
+    response = jsonify(annotations(req))
+
+    if key is None:
+        return response
+    return etag_response(response, key, req)
+
+
+@gfhttpva.route("/metrics", methods=("GET",))
+def get_metrics():
+    """metrics URL function to expose metrics for Prometheus
+
+    Returns
+    -------
+    flask.Response
+        metrics in Prometheus text format
+    """
+
+    return current_app.response_class(metrics.render(),
+                                      content_type=metrics.CONTENT_TYPE)
 
 
 @gfhttpva.errorhandler(InvalidRequest)
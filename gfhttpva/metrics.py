@@ -0,0 +1,327 @@
+import math
+from threading import Lock
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000, 100000000)
+# label of channels which are not tracked by the client pool
+OTHER = "other"
+
+
+def _escape(value):
+    """Escape label value for Prometheus text format
+
+    Parameters
+    ----------
+    value : obj
+        label value
+
+    Returns
+    -------
+    str
+        escaped label value
+    """
+
+    return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _format_value(value):
+    """Format sample value for Prometheus text format
+
+    Parameters
+    ----------
+    value : float
+        sample value
+
+    Returns
+    -------
+    str
+        formatted sample value
+    """
+
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(object):
+    """
+    Base class of metric with labels
+
+    Attributes
+    ----------
+    name : str
+        metric name
+    documentation : str
+        help text of metric
+    labelnames : tuple of str
+        label names of metric
+    _values : dict
+        value for tuple of label values
+    _lock : threading.Lock
+        lock for _values
+    """
+
+    mtype = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def _labels(self, labels, extra=()):
+        pairs = list(zip(self.labelnames, labels)) + list(extra)
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join('%s="%s"' % (key, _escape(val))
+                                 for key, val in pairs)
+
+    def remove(self, labels):
+        """Remove values of label values
+
+        Parameters
+        ----------
+        labels : tuple
+            label values
+        """
+
+        labels = tuple(str(label) for label in labels)
+        with self._lock:
+            self._values.pop(labels, None)
+
+    def clear(self):
+        """Clear values of metric"""
+
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        """Get samples of metric
+
+        Returns
+        -------
+        list of tuple
+            (name suffix, label values, extra labels, value) of samples
+        """
+
+        with self._lock:
+            return [("", labels, (), value)
+                    for labels, value in sorted(self._values.items())]
+
+    def render(self):
+        """Render metric in Prometheus text format
+
+        Returns
+        -------
+        list of str
+            lines of metric
+        """
+
+        lines = ["# HELP %s %s" % (self.name, self.documentation),
+                 "# TYPE %s %s" % (self.name, self.mtype)]
+        for suffix, labels, extra, value in self.samples():
+            lines.append("%s%s%s %s" % (self.name, suffix,
+                                        self._labels(labels, extra),
+                                        _format_value(value)))
+        return lines
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing counter
+    """
+
+    mtype = "counter"
+
+    def inc(self, labels=(), amount=1):
+        """Increase counter
+
+        Parameters
+        ----------
+        labels : tuple, optional
+            label values (default is ())
+        amount : float, optional
+            amount to increase (default is 1)
+        """
+
+        labels = tuple(str(label) for label in labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels=()):
+        """Get counter value
+
+        Parameters
+        ----------
+        labels : tuple, optional
+            label values (default is ())
+
+        Returns
+        -------
+        float
+            counter value
+        """
+
+        labels = tuple(str(label) for label in labels)
+        with self._lock:
+            return self._values.get(labels, 0)
+
+
+class Gauge(Counter):
+    """
+    Value which can go up and down
+    """
+
+    mtype = "gauge"
+
+    def dec(self, labels=(), amount=1):
+        """Decrease gauge
+
+        Parameters
+        ----------
+        labels : tuple, optional
+            label values (default is ())
+        amount : float, optional
+            amount to decrease (default is 1)
+        """
+
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    """
+    Histogram of observed values in cumulative buckets
+
+    Attributes
+    ----------
+    buckets : tuple of float
+        upper bounds of buckets
+    """
+
+    mtype = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        Metric.__init__(self, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, labels=()):
+        """Observe value
+
+        Parameters
+        ----------
+        value : float
+            observed value
+        labels : tuple, optional
+            label values (default is ())
+        """
+
+        labels = tuple(str(label) for label in labels)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                # bucket counts and sum, the +Inf bucket is the count
+                counts = self._values[labels] = [0] * len(self.buckets) + [0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += value
+
+    def get_count(self, labels=()):
+        """Get number of observed values
+
+        Parameters
+        ----------
+        labels : tuple, optional
+            label values (default is ())
+
+        Returns
+        -------
+        int
+            number of observed values
+        """
+
+        labels = tuple(str(label) for label in labels)
+        with self._lock:
+            counts = self._values.get(labels)
+            return counts[-2] if counts else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for labels, counts in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    le = (("le", _format_value(float(bound))),)
+                    samples.append(("_bucket", labels, le, count))
+                samples.append(("_sum", labels, (), counts[-1]))
+                samples.append(("_count", labels, (), counts[-2]))
+        return samples
+
+
+REQUESTS = Counter("gfhttpva_requests_total",
+                   "Number of HTTP requests", ("route", "status"))
+REQUEST_LATENCY = Histogram("gfhttpva_request_duration_seconds",
+                            "Latency of HTTP requests", ("route",))
+RESPONSE_SIZE = Histogram("gfhttpva_response_size_bytes",
+                          "Size of HTTP response bodies", ("route",),
+                          buckets=SIZE_BUCKETS)
+RPC_LATENCY = Histogram("gfhttpva_rpc_duration_seconds",
+                        "Latency of pvAccess RPC invoke", ("ch",))
+RPC_ERRORS = Counter("gfhttpva_rpc_errors_total",
+                     "Number of failed pvAccess RPC invoke", ("ch",))
+RPC_REJECTED = Counter("gfhttpva_rpc_rejected_total",
+                       "Number of pvAccess RPC rejected by open circuit",
+                       ("ch",))
+DECODE_LATENCY = Histogram("gfhttpva_decode_duration_seconds",
+                           "Time to decode pvAccess RPC responses")
+SERIALIZE_LATENCY = Histogram("gfhttpva_serialize_duration_seconds",
+                              "Time to serialize JSON responses")
+RPC_CLIENTS = Gauge("gfhttpva_rpc_clients",
+                    "Number of live pvAccess RPC clients", ("ch",))
+IN_FLIGHT = Gauge("gfhttpva_requests_in_flight",
+                  "Number of HTTP requests in progress")
+LOG_DROPPED = Counter("gfhttpva_log_dropped_total",
+                      "Number of log records dropped by full queue")
+
+# metrics labeled with channel name
+CHANNEL_METRICS = (RPC_LATENCY, RPC_ERRORS, RPC_REJECTED,
+                   RPC_CLIENTS)
+
+METRICS = (REQUESTS, REQUEST_LATENCY, RESPONSE_SIZE, RPC_LATENCY,
+           RPC_ERRORS, RPC_REJECTED, DECODE_LATENCY, SERIALIZE_LATENCY,
+           RPC_CLIENTS, IN_FLIGHT, LOG_DROPPED)
+
+
+def remove_channel(name):
+    """Remove values of channel from metrics labeled with channel name
+
+    Parameters
+    ----------
+    name : str
+        channel name
+    """
+
+    for metric in CHANNEL_METRICS:
+        metric.remove((name,))
+
+
+def render():
+    """Render all metrics in Prometheus text format
+
+    Returns
+    -------
+    str
+        metrics in Prometheus text format
+    """
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
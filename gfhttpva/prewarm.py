@@ -0,0 +1,254 @@
+import os
+import re
+import sys
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from threading import Event, Thread, get_native_id
+
+from .metrics import IN_FLIGHT
+
+
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+RELATIVE = re.compile(r"^now(?:-(\d+)([smhdw]))?$")
+
+
+def parse_time(value, now):
+    """Convert Grafana dashboard time to ISO time format string in UTC
+
+    Parameters
+    ----------
+    value : str
+        "now", relative time like "now-6h" or ISO time format str
+    now : datetime.datetime
+        current time in UTC
+
+    Returns
+    -------
+    str
+        ISO time format str in UTC or None if value is not supported
+    """
+
+    match = RELATIVE.match(str(value))
+    if match:
+        dt = now
+        if match.group(1):
+            seconds = int(match.group(1)) * UNITS[match.group(2)]
+            dt = now - timedelta(seconds=seconds)
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    try:
+        dt = datetime.strptime(str(value)[:19], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _datasource_names(datasource):
+    if isinstance(datasource, dict):
+        return [str(datasource[key]) for key in ("uid", "name")
+                if key in datasource]
+    if datasource:
+        return [str(datasource)]
+    return []
+
+
+def _panels(panels):
+    for panel in panels:
+        yield panel
+        # panels in collapsed rows
+        for sub in _panels(panel.get("panels", [])):
+            yield sub
+
+
+def dashboard_queries(dashboard, datasources, now=None):
+    """Create query requests for targets of dashboard
+
+    Parameters
+    ----------
+    dashboard : dict
+        Grafana dashboard definition
+    datasources : dict
+        jsonData of datasource for datasource name or uid
+    now : datetime.datetime, optional
+        current time in UTC (default is None to use current time)
+
+    Returns
+    -------
+    list of dict
+        query request for each target
+    """
+
+    dashboard = dashboard.get("dashboard", dashboard)
+    now = now or datetime.now(timezone.utc)
+    dashboard_time = dashboard.get("time", {})
+    start = parse_time(dashboard_time.get("from", "now-6h"), now)
+    end = parse_time(dashboard_time.get("to", "now"), now)
+    if start is None or end is None:
+        return []
+
+    panels = list(dashboard.get("panels", []))
+    for row in dashboard.get("rows", []):
+        panels.extend(row.get("panels", []))
+
+    requests = []
+    for panel in _panels(panels):
+        for target in panel.get("targets", []):
+            if target.get("hide") or "target" not in target:
+                continue
+            names = (_datasource_names(target.get("datasource")) +
+                     _datasource_names(panel.get("datasource")))
+            json_data = next((datasources[name] for name in names
+                              if name in datasources), None)
+            if json_data is None:
+                continue
+
+            req = {"range": {"from": start, "to": end},
+                   "targets": [{"target": target["target"],
+                                "refId": target.get("refId", "A"),
+                                "type": target.get("type", "timeserie"),
+                                "params": target.get("params", {})}],
+                   "jsonData": json_data}
+            if "maxDataPoints" in panel:
+                req["maxDataPoints"] = panel["maxDataPoints"]
+            requests.append(req)
+
+    return requests
+
+
+class Prewarmer(object):
+    """
+    Background runner of dashboard queries to warm caches
+
+    Dashboard JSON files in a directory are read on every round and the
+    queries of their targets are run one by one. A query is run only
+    while no HTTP request is in progress, so interactive requests are
+    not delayed by pre-warming.
+
+    Attributes
+    ----------
+    query : callable
+        function to run query request
+    path : str or None
+        directory of dashboard JSON files, None disables pre-warming
+    interval : float
+        interval in seconds between rounds
+    datasources : dict
+        jsonData of datasource for datasource name or uid
+    app : flask.Flask
+        application whose context is used in the background thread
+    idle_wait : float
+        time in seconds to wait for HTTP requests to finish
+    _stop : threading.Event
+        event to stop the background thread
+    _thread : threading.Thread
+        background thread to run queries
+    """
+
+    idle_wait = 0.05
+
+    def __init__(self, query=None, path=None, interval=300,
+                 datasources=None, app=None):
+        self.query = query
+        self.path = path
+        self.interval = interval
+        self.datasources = dict(datasources or {})
+        self.app = app
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        """Start the background thread if pre-warming is enabled"""
+
+        if not self.path or self._thread is not None:
+            return
+
+        self._thread = Thread(target=self._run, name="gfhttpva-prewarm",
+                              daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
+    def requests(self):
+        """Read dashboard files and create query requests
+
+        Returns
+        -------
+        list of dict
+            query request for each target of dashboards
+        """
+
+        try:
+            names = sorted(os.listdir(self.path))
+        except OSError:
+            return []
+
+        requests = []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.path, name)) as f:
+                    dashboard = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if isinstance(dashboard, dict):
+                requests.extend(dashboard_queries(dashboard,
+                                                  self.datasources))
+        return requests
+
+    def run_once(self):
+        """Run queries of all dashboards once
+
+        Returns
+        -------
+        int
+            number of successful queries
+        """
+
+        done = 0
+        for req in self.requests():
+            if not self._wait_idle():
+                break
+            try:
+                self.query(req)
+            except Exception:
+                # failed queries are retried in the next round
+                continue
+            done += 1
+        return done
+
+    def _wait_idle(self):
+        while IN_FLIGHT.get() > 0:
+            if self._stop.wait(self.idle_wait):
+                return False
+        return not self._stop.is_set()
+
+    def _run(self):
+        # threads have their own nice value on Linux
+        if sys.platform.startswith("linux"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, get_native_id(), 19)
+            except OSError:
+                pass
+
+        while True:
+            start = time.monotonic()
+            if self.app is not None:
+                with self.app.app_context():
+                    self.run_once()
+            else:
+                self.run_once()
+            wait = max(self.interval - (time.monotonic() - start), 0)
+            if self._stop.wait(wait):
+                return
+
+
+PREWARMER = Prewarmer()
@@ -1,15 +1,214 @@
 import sys
-from threading import RLock
+import time
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from collections import OrderedDict
+from threading import Lock, RLock
 
 import numpy as np
-import pandas as pd
 
 import pvaccess as pva
+from .breaker import CircuitBreaker
+from .cache import ResultCache, fingerprint
+from .clientpool import ClientPool
+from .diskcache import DiskCache
+from .downsample import aggregate, downsample
+from .encoder import RawJSON, encode_str
 from .exception import InvalidRequest
+from .metrics import DECODE_LATENCY, RPC_ERRORS, RPC_LATENCY, RPC_REJECTED
+from .searchindex import SearchIndex
+from .segment import SegmentStore
+from .singleflight import SingleFlight
+from .timezone import TIMEZONE
+from .timing import phase
 
 from flask import current_app
 
 
+def _tolist(values):
+    """Convert column values to list of Python objects
+
+    Parameters
+    ----------
+    values : numpy.ndarray or list
+        column values of NTTable
+
+    Returns
+    -------
+    list
+        column values as list
+    """
+
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return list(values)
+
+
+def _ints(values):
+    """Convert column values to list of int
+
+    Fractional parts of float values are truncated.
+
+    Parameters
+    ----------
+    values : numpy.ndarray or list
+        column values of NTTable
+
+    Returns
+    -------
+    list of int
+        column values as int
+
+    Raises
+    ------
+    InvalidRequest
+        if values are not finite numbers
+    """
+
+    if isinstance(values, np.ndarray):
+        if values.dtype.kind == "f":
+            if not np.all(np.isfinite(values)):
+                raise InvalidRequest("RPC returned value is not integer",
+                                     status_code=400, details={})
+            values = values.astype(np.int64)
+        if values.dtype.kind in "iub":
+            return values.tolist()
+        values = values.tolist()
+
+    ints = []
+    for value in values:
+        try:
+            ints.append(int(value))
+        except (TypeError, ValueError, OverflowError):
+            raise InvalidRequest("RPC returned value is not integer",
+                                 status_code=400, details={})
+    return ints
+
+
+def _strs(values):
+    """Convert column values to list of str
+
+    Parameters
+    ----------
+    values : numpy.ndarray or list
+        column values of NTTable
+
+    Returns
+    -------
+    list of str
+        column values as str
+    """
+
+    return [str(value) for value in _tolist(values)]
+
+
+def _lists(obj):
+    """Convert numpy arrays in decoded pvData to lists
+
+    Parameters
+    ----------
+    obj : obj
+        decoded pvData
+
+    Returns
+    -------
+    obj
+        decoded pvData as decoded without numpy arrays
+    """
+
+    if isinstance(obj, dict):
+        return {key: _lists(val) for key, val in obj.items()}
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return obj
+
+
+def annotations_json(annotation, time, title, tags, text):
+    """Encode annotation columns as JSON
+
+    The output is the same as compact JSON with sorted keys and escaped
+    non-ASCII characters of the list of annotation dicts. Tags are split
+    on the encoded strings, as commas are never escaped.
+
+    Parameters
+    ----------
+    annotation : obj
+        annotation to return it as str
+    time : list of int
+        time of annotations
+    title : list of str
+        title of annotations
+    tags : list of str
+        comma separated tags of annotations
+    text : list of str
+        text of annotations
+
+    Returns
+    -------
+    encoder.RawJSON
+        JSON of list of annotations
+    """
+
+    head = '{"annotation":%s,"tags":[' % encode_str(str(annotation))
+    fmt = head.replace("%", "%%") + '%s],"text":%s,"time":%d,"title":%s}'
+    tags = [encode_str(tag).replace(",", '","') for tag in tags]
+    rows = zip(tags, map(encode_str, text), time, map(encode_str, title))
+
+    return RawJSON("[" + ",".join([fmt % row for row in rows]) + "]")
+
+
+def _datapoints(value, time_ms):
+    """Interleave value and time into datapoints
+
+    Integer values are stacked with time into an int64 numpy array, which
+    is serialized without Python objects. Other values are zipped into
+    pairs, as stacking float values would turn time into float.
+
+    Parameters
+    ----------
+    value : numpy.ndarray or list
+        value of datapoints
+    time_ms : numpy.ndarray
+        int64 time of datapoints in milliseconds
+
+    Returns
+    -------
+    numpy.ndarray or list of tuple
+        pairs of value and its time in milliseconds
+    """
+
+    value = np.asarray(value)
+    kind = value.dtype.kind
+    if kind == "i" or (kind == "u" and value.dtype.itemsize < 8):
+        return np.column_stack((value.astype(np.int64), time_ms))
+    if kind == "f":
+        value = value.astype(np.float64)
+
+    return list(zip(_tolist(value), _tolist(time_ms)))
+
+
+def table_rows(values, start=0, stop=None):
+    """Interleave table column values into rows
+
+    Parameters
+    ----------
+    values : list
+        list of column values
+    start : int, optional
+        index of the first row (default is 0)
+    stop : int, optional
+        index after the last row (default is None)
+
+    Returns
+    -------
+    list of tuple
+        rows of table
+    """
+
+    return list(zip(*[_tolist(value[start:stop]) for value in values]))
+
+
 class Pvaapi(object):
     """
     pvAccess api wrapper
@@ -18,20 +217,165 @@ class Pvaapi(object):
     ----------
     timeout : float
         timeout for pvAccess RPC in seconds
-    _clients : dict
-        pvAccess RpcClient for ch name
+    max_workers : int
+        maximum number of concurrent pvAccess RPC calls for one request
+    downsample : str or None
+        downsampling method for timeseries ("lttb", "minmax" or None)
+    split_window : float
+        width in seconds of sub-ranges into which longer timeseries
+        ranges are split, 0 disables splitting
+    cache : cache.ResultCache
+        cache of decoded pvAccess RPC responses
+    segments : segment.SegmentStore
+        store of fetched timeseries to fetch only missing time ranges
+    disk : diskcache.DiskCache
+        on-disk cache of tables and timeseries for closed time ranges
+    clients : clientpool.ClientPool
+        pool of pvAccess RpcClient for ch name
+    breaker : breaker.CircuitBreaker
+        circuit breaker to fail fast for unresponsive channels
+    search_index : searchindex.SearchIndex
+        local index of metric names for search
+    max_templates : int
+        maximum number of kept request templates
     _lock : threading.RLock
-        lock for _clients
+        lock for _executors
+    _executors : dict
+        max_workers and executor to run pvAccess RPC calls concurrently
+        for targets (False) and for sub-ranges of one target (True)
+    _flights : singleflight.SingleFlight
+        coalescer of identical pvAccess RPC queries in flight
+    _templates : collections.OrderedDict
+        prototype of request pvData for query fields in LRU order
+    _template_lock : threading.Lock
+        lock for _templates
     """
 
-    def __init__(self, timeout=1):
+    max_templates = 256
+
+    def __init__(self, timeout=1, max_workers=8, downsample=None):
         self.timeout = timeout
-        self._clients = {}
+        self.max_workers = max_workers
+        self.downsample = downsample
+        self.split_window = 0
+        self.cache = ResultCache()
+        self.segments = SegmentStore()
+        self.disk = DiskCache()
+        self.clients = ClientPool()
+        self.breaker = CircuitBreaker()
+        self.search_index = SearchIndex(self.search_all)
         self._lock = RLock()
+        self._executors = {}
+        self._flights = SingleFlight()
+        self._templates = OrderedDict()
+        self._template_lock = Lock()
+
+    def _get_executor(self, nested=False):
+        """Get executor for concurrent pvAccess RPC calls
+
+        The executor is rebuilt when max_workers has been changed.
+        Calls made from calls in the executor use another executor, so
+        they never wait for workers which are waiting for them.
+
+        Parameters
+        ----------
+        nested : bool, optional
+            whether get executor for calls made from calls in the
+            executor (default is False)
+
+        Returns
+        -------
+        concurrent.futures.ThreadPoolExecutor
+            executor bounded by max_workers
+        """
+
+        with self._lock:
+            workers, executor = self._executors.get(nested, (None, None))
+            if workers != self.max_workers:
+                if executor is not None:
+                    executor.shutdown(wait=False)
+                prefix = "gfhttpva-nested" if nested else "gfhttpva"
+                executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                              thread_name_prefix=prefix)
+                self._executors[nested] = (self.max_workers, executor)
+
+        return executor
+
+    def map_calls(self, calls, nested=False):
+        """Run calls concurrently and return their futures in order
+
+        Each call runs in a copy of the caller's context, so the Flask
+        application and request contexts are available in the workers.
+        A single call, or all calls if max_workers is less than 2, are
+        run in the caller's thread and the run stops at the first error.
+
+        Parameters
+        ----------
+        calls : list of tuple
+            list of (function, args) to call
+        nested : bool, optional
+            whether calls are made from a call run by map_calls
+            (default is False)
+
+        Returns
+        -------
+        list of concurrent.futures.Future
+            futures in the same order as calls
+        """
+
+        if len(calls) < 2 or self.max_workers < 2:
+            futures = []
+            for func, args in calls:
+                future = Future()
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+                    futures.append(future)
+                    break
+                futures.append(future)
+            return futures
+
+        executor = self._get_executor(nested)
+        return [executor.submit(contextvars.copy_context().run, func, *args)
+                for func, args in calls]
+
+    def results(self, futures):
+        """Get results of futures in order
+
+        Futures which have not started are cancelled at the first error,
+        so calls of a failed request do not occupy the executor.
+
+        Parameters
+        ----------
+        futures : list of concurrent.futures.Future
+            futures returned by map_calls
+
+        Returns
+        -------
+        list
+            results in the same order as futures
+
+        Raises
+        ------
+        Exception
+            the first error of futures in order
+        """
+
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
 
     def _get_rpc_client(self, ch_name):
         """Get pvAccess RPC Client
 
+        pvaccess.RpcClient can not invoke concurrently, so the client is
+        taken out of the client pool and must be returned with
+        _put_rpc_client after use.
+
         Parameters
         ----------
         ch_name : str
@@ -41,17 +385,177 @@ class Pvaapi(object):
         -------
         pvaccess.RpcClient
             pvAccess RPC Client for channel name
+
+        Raises
+        ------
+        InvalidRequest
+            if no client for channel name is available within timeout
         """
         self._check_ch_name(ch_name)
-        name = str(ch_name)
 
-        with self._lock:
-            if name not in self._clients:
-                self._clients[name] = pva.RpcClient(name)
-            client = self._clients[name]
+        client = self.clients.checkout(str(ch_name), self.timeout)
+        if client is None:
+            raise InvalidRequest("RPC client busy", status_code=400,
+                                 details={"ch": ch_name})
 
         return client
 
+    def _put_rpc_client(self, ch_name, client, failed=False):
+        """Return pvAccess RPC Client to the client pool
+
+        Parameters
+        ----------
+        ch_name : str
+            pvAccess channel name
+        client : pvaccess.RpcClient
+            pvAccess RPC Client taken by _get_rpc_client
+        failed : bool, optional
+            whether the client failed and must be closed
+            (default is False)
+        """
+
+        if failed:
+            self.clients.discard(str(ch_name), client)
+        else:
+            self.clients.checkin(str(ch_name), client)
+
+    def _invoke(self, ch_name, request):
+        """Invoke pvAccess RPC
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        request : pvaccess.PvObject
+            pvAccess RPC request pvData
+
+        Returns
+        -------
+        pvaccess.PvObject
+            pvAccess RPC response
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC or the circuit of the channel
+            is open
+        """
+
+        name = str(ch_name)
+        if not self.breaker.allow(name):
+            RPC_REJECTED.inc((self.clients.label(name),))
+            retry_after = round(self.breaker.retry_after(name), 1)
+            raise InvalidRequest("RPC channel is unavailable",
+                                 status_code=503,
+                                 details={"ch": ch_name,
+                                          "retry_after": retry_after}
+                                 )
+
+        # allowed calls are always reported, so the probe slot of
+        # half-open circuit is released whatever happens
+        reported = False
+        try:
+            rpc = self._get_rpc_client(name)
+
+            # channel names come from requests, so only pooled channels
+            # are labeled not to grow metric series without bound
+            label = self.clients.label(name)
+            start = time.perf_counter()
+            failed = True
+            try:
+                with phase("rpc"):
+                    response = rpc.invoke(request, self.timeout)
+                failed = False
+            except pva.PvaException as e:
+                RPC_ERRORS.inc((label,))
+                self.breaker.failure(name)
+                reported = True
+                raise InvalidRequest(str(e), status_code=400,
+                                     details={"request": str(request),
+                                              "ch": ch_name}
+                                     )
+            finally:
+                RPC_LATENCY.observe(time.perf_counter() - start, (label,))
+                self._put_rpc_client(ch_name, rpc, failed)
+
+            self.breaker.success(name)
+            reported = True
+            return response
+        finally:
+            if not reported:
+                self.breaker.cancel(name)
+
+    def _query(self, ch_name, entity, params, starttime, endtime,
+               labels, nturi):
+        """Get decoded pvAccess RPC response for query
+
+        The decoded response is shared through the result cache and with
+        concurrent callers of the same query, so it must not be modified
+        by callers.
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        params : dict
+            parameters for optional RPC request query
+        starttime : str or unicode
+            start time as string
+        endtime : str or unicode
+            end time as string
+        labels : dict
+            labels for entity, starttime and endtime
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        dict
+            decoded pvAccess RPC response
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
+
+        self._check_ch_name(ch_name)
+
+        key = fingerprint("rpc", ch_name, entity, params, starttime, endtime,
+                          labels, nturi)
+        res = self.cache.get(key)
+        if res is not None:
+            return res
+
+        with phase("build"):
+            request = self._create_request(entity, params, starttime,
+                                           endtime, labels, ch_name, nturi)
+
+        def fetch():
+            response = self._invoke(ch_name, request)
+
+            start = time.perf_counter()
+            with phase("decode"):
+                res = response.get()
+            DECODE_LATENCY.observe(time.perf_counter() - start)
+            self.cache.put(key, ch_name, res)
+            return res
+
+        # identical queries in flight are coalesced into one RPC, and
+        # waiters wait as long as the caller which checks out a client
+        # and invokes RPC with timeout each
+        try:
+            res = self._flights.do(key, fetch, 2 * self.timeout)
+        except FutureTimeoutError:
+            raise InvalidRequest("RPC timeout", status_code=400,
+                                 details={"request": str(request),
+                                          "ch": ch_name}
+                                 )
+
+        return res
+
     def _create_request(self, entity, params, starttime, endtime,
                         labels, path="", nturi=False):
         """Create pvAccess RPC request
@@ -146,23 +650,65 @@ class Pvaapi(object):
             pvAccess RPC request pvData
         """
 
+        request = self._get_request_template(query_type, path, nturi)
+
         if nturi:
-            request = pva.PvObject({"scheme": pva.STRING,
-                                    "authority": pva.STRING,
-                                    "path": pva.STRING,
-                                    "query": query_type
-                                    },
-                                   "epics:nt/NTURI:1.0")
-            request["scheme"] = "pva"
-            request["authority"] = ""
-            request["path"] = str(path)
             request.setStructure("query", query_val)
         else:
-            request = pva.PvObject(query_type)
             request.set(query_val)
 
         return request
 
+    def _get_request_template(self, query_type, path="", nturi=False):
+        """Get copy of RPC request pvData with the structure of query
+
+        Building the structure of pvData is much slower than copying it,
+        so a prototype is kept for each set of query fields and path.
+
+        Parameters
+        ----------
+        query_type : dict
+            dict of pvaccess type for query
+        path : str
+            path for nturi style path
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        pvaccess.PvObject
+            pvAccess RPC request pvData whose query values are not set
+        """
+
+        key = (tuple(query_type.items()), str(path) if nturi else "",
+               bool(nturi))
+
+        with self._template_lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template.copy()
+
+        if nturi:
+            template = pva.PvObject({"scheme": pva.STRING,
+                                     "authority": pva.STRING,
+                                     "path": pva.STRING,
+                                     "query": query_type
+                                     },
+                                    "epics:nt/NTURI:1.0")
+            template["scheme"] = "pva"
+            template["authority"] = ""
+            template["path"] = str(path)
+        else:
+            template = pva.PvObject(query_type)
+
+        with self._template_lock:
+            self._templates[key] = template
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+
+        return template.copy()
+
     def _get_value_from_table(self, table, key):
         """Get value from NTTable style dict
 
@@ -215,9 +761,43 @@ class Pvaapi(object):
             current_app.logger.error("valget: Empty ch name")
             raise InvalidRequest("RPC ch name is empty", status_code=400)
 
-    def valget(self, ch_name, entity, params, starttime, endtime,
-               labels, nturi):
-        """Get timesiries values using pvAccess RPC
+    def _get_timeseries(self, res):
+        """Get time and value of timeseries from decoded RPC response
+
+        Parameters
+        ----------
+        res : dict
+            decoded NTTable style RPC response
+
+        Returns
+        -------
+        tuple
+            int64 time in milliseconds and value of datapoints
+
+        Raises
+        ------
+        InvalidRequest
+            if response has no required column
+        """
+
+        value = self._get_value_from_table(res, "value")
+        seconds = self._get_value_from_table(res, "secondsPastEpoch")
+        nano = self._get_value_from_table(res, "nanoseconds")
+
+        seconds = np.asarray(seconds)
+        if np.issubdtype(seconds.dtype, np.integer):
+            seconds_ms = seconds.astype(np.int64) * 1000
+        else:
+            seconds_ms = np.trunc(seconds * 1000).astype(np.int64)
+
+        # exact time in milliseconds with int64
+        time_ms = seconds_ms + np.asarray(nano).astype(np.int64) // 10**6
+
+        return time_ms, value
+
+    def _get_timeseries_segments(self, ch_name, entity, params, starttime,
+                                 endtime, labels, nturi):
+        """Get timeseries fetching only time ranges not in segment store
 
         Parameters
         ----------
@@ -239,7 +819,7 @@ class Pvaapi(object):
         Returns
         -------
         tuple
-            tuble of value and its time
+            time in milliseconds and value of datapoints
 
         Raises
         ------
@@ -247,36 +827,160 @@ class Pvaapi(object):
             if failed to call pvAccess RPC
         """
 
-        rpc = self._get_rpc_client(str(ch_name))
+        self._check_ch_name(ch_name)
 
-        request = self._create_request(entity, params, starttime,
-                                       endtime, labels, ch_name, nturi)
-        try:
-            response = rpc.invoke(request, self.timeout)
-        except pva.PvaException as e:
-            raise InvalidRequest(str(e), status_code=400,
-                                 details={"request": str(request),
-                                          "ch": ch_name}
-                                 )
+        key = fingerprint("series", ch_name, entity, params, "", "",
+                          labels, nturi)
+        start = TIMEZONE.to_ms(starttime)
+        end = TIMEZONE.to_ms(endtime)
+
+        covered_end = self.segments.covered_end()
+        kept = True
+        for m_start, m_end in self.segments.missing(key, start, end):
+            time_ms, value = self._get_timeseries_range(
+                ch_name, entity, params, m_start, m_end, labels, nturi)
+            if not self.segments.add(key, m_start, m_end, time_ms, value):
+                kept = False
+
+        series = None
+        if kept:
+            series = self.segments.get(key, start, end, covered_end)
+        if series is None:
+            # truncated or evicted by other series, then fetch whole range
+            res = self._query(ch_name, entity, params, starttime, endtime,
+                              labels, nturi)
+            series = self._get_timeseries(res)
+
+        return series
+
+    def _split(self, start, end):
+        """Split time range into windows aligned to split_window
 
-        res = response.get()
+        Parameters
+        ----------
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
 
-        value = self._get_value_from_table(res, "value")
-        seconds = self._get_value_from_table(res, "secondsPastEpoch")
-        nano = self._get_value_from_table(res, "nanoseconds")
+        Returns
+        -------
+        list of tuple
+            (start, end) windows in milliseconds
+        """
 
-        time_ms = np.trunc(seconds*1000 + nano//(10**6))
+        window = int(self.split_window * 1000)
+        if window <= 0 or end - start <= window:
+            return [(start, end)]
 
-        datapoints = pd.DataFrame({"value": value, "time": time_ms})
+        # aligned windows are the same for ranges moving with time,
+        # so their results can be reused from the cache
+        first = (start // window + 1) * window
+        bounds = [start] + list(range(first, end, window)) + [end]
+        return list(zip(bounds[:-1], bounds[1:]))
 
-        # order of datapoints' columns  must be value, time for tolist
-        datapoints = datapoints[['value', 'time']]
+    def _get_timeseries_window(self, ch_name, entity, params, start, end,
+                               labels, nturi):
+        """Get timeseries of time range in milliseconds with one RPC
 
-        return datapoints.values.tolist()
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        params : dict
+            parameters for optional RPC request query
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
+        labels : dict
+            labels for entity, starttime and endtime
+        nturi : bool
+            whether create request as nturi style or not
 
-    def valget_table(self, ch_name, entity, params,
-                     starttime, endtime, labels, nturi):
-        """Get table values using pvAccess RPC
+        Returns
+        -------
+        tuple
+            time in milliseconds and value of datapoints
+        """
+
+        res = self._query(ch_name, entity, params, TIMEZONE.from_ms(start),
+                          TIMEZONE.from_ms(end, ceil=True), labels, nturi)
+        with phase("convert"):
+            return self._get_timeseries(res)
+
+    def _get_timeseries_range(self, ch_name, entity, params, start, end,
+                              labels, nturi):
+        """Get timeseries of time range split into concurrent RPCs
+
+        The range is split into windows of split_window seconds, whose
+        datapoints are concatenated in time order. Datapoints at a window
+        boundary returned by both windows are kept once.
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        params : dict
+            parameters for optional RPC request query
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
+        labels : dict
+            labels for entity, starttime and endtime
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        tuple
+            time in milliseconds and value of datapoints
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
+
+        calls = [(self._get_timeseries_window,
+                  (ch_name, entity, params, w_start, w_end, labels, nturi))
+                 for w_start, w_end in self._split(start, end)]
+        # called from target calls in the executor, then use another one
+        futures = self.map_calls(calls, nested=True)
+
+        times = []
+        values = []
+        last = None
+        for time_ms, value in self.results(futures):
+            time_ms = np.asarray(time_ms)
+            value = np.asarray(value)
+            if last is not None:
+                keep = time_ms > last
+                time_ms, value = time_ms[keep], value[keep]
+            if len(time_ms):
+                last = time_ms[-1]
+                times.append(time_ms)
+                values.append(value)
+
+        if len(times) == 1:
+            return times[0], values[0]
+        if not times:
+            return time_ms, value
+        return np.concatenate(times), np.concatenate(values)
+
+    def valget(self, ch_name, entity, params, starttime, endtime,
+               labels, nturi, max_points=None, aggregation=None,
+               interval=None):
+        """Get timesiries values using pvAccess RPC
+
+        The values are reduced to one point for each interval with the
+        aggregation function if both are given, and then downsampled to
+        max_points with the downsample method if it is set.
 
         Parameters
         ----------
@@ -294,11 +998,18 @@ class Pvaapi(object):
             labels for entity, starttime and endtime
         nturi : bool
             whether create request as nturi style or not
+        max_points : int, optional
+            maximum number of datapoints (default is None)
+        aggregation : str, optional
+            aggregation function ("mean", "min", "max", "last" or "count")
+            (default is None)
+        interval : int, optional
+            interval of aggregation in milliseconds (default is None)
 
         Returns
         -------
-        list of dict
-            list of table values dict
+        numpy.ndarray or list of tuple
+            pairs of value and its time in milliseconds
 
         Raises
         ------
@@ -306,19 +1017,74 @@ class Pvaapi(object):
             if failed to call pvAccess RPC
         """
 
-        rpc = self._get_rpc_client(str(ch_name))
+        if self.segments.maxsize:
+            time_ms, value = self._get_timeseries_segments(
+                ch_name, entity, params, starttime, endtime, labels, nturi)
+        elif self.split_window:
+            self._check_ch_name(ch_name)
+            time_ms, value = self._get_timeseries_range(
+                ch_name, entity, params, TIMEZONE.to_ms(starttime),
+                TIMEZONE.to_ms(endtime), labels, nturi)
+        else:
+            res = self._query(ch_name, entity, params, starttime, endtime,
+                              labels, nturi)
+            with phase("convert"):
+                time_ms, value = self._get_timeseries(res)
 
-        request = self._create_request(entity, params, starttime,
-                                       endtime, labels, ch_name, nturi)
-        try:
-            response = rpc.invoke(request, self.timeout)
-        except pva.PvaException as e:
-            raise InvalidRequest(str(e), status_code=400,
-                                 details={"request": str(request),
-                                          "ch": ch_name}
-                                 )
+        with phase("convert"):
+            if aggregation and interval:
+                time_ms, value = aggregate(aggregation, time_ms, value,
+                                           interval)
+            if self.downsample and max_points:
+                time_ms, value = downsample(self.downsample, time_ms, value,
+                                            max_points)
+
+            return _datapoints(value, time_ms)
+
+    def valget_table_columns(self, ch_name, entity, params,
+                             starttime, endtime, labels, nturi):
+        """Get table columns and their values using pvAccess RPC
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        params : dict
+            parameters for optional RPC request query
+        starttime : str or unicode
+            start time as string
+        endtime : str or unicode
+            end time as string
+        labels : dict
+            labels for entity, starttime and endtime
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        tuple
+            list of column dict and list of column values
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
+
+        key = None
+        if self.disk.enabled():
+            start = TIMEZONE.to_ms(starttime)
+            end = TIMEZONE.to_ms(endtime)
+            if self.disk.closed(end):
+                key = fingerprint("table", ch_name, entity, params,
+                                  starttime, endtime, labels, nturi)
+                for _, _, values, meta in self.disk.get(key):
+                    return self._table_columns(meta["labels"]), values
 
-        res = response.get()
+        res = self._query(ch_name, entity, params, starttime, endtime,
+                          labels, nturi)
 
         try:
             labels = res["labels"]
@@ -328,33 +1094,137 @@ class Pvaapi(object):
                                  status_code=400,
                                  details={"RPC return": str(res)})
 
-        columns = []
-        for label in labels:
-            if label.lower() == "time":
-                columns.append({"text": label, "type": "time"})
-            else:
-                columns.append({"text": label})
+        columns = self._table_columns(labels)
 
         try:
-            frame_dict = {label: res["value"]["column"+str(i)]
-                          for i, label in enumerate(labels)}
+            values = [res["value"]["column"+str(i)]
+                      for i in range(len(labels))]
         except KeyError:
             current_app.logger.error("valget_table: value KeyError")
             raise InvalidRequest("RPC returned value key error",
                                  status_code=400,
                                  details={"RPC return": str(res)})
 
-        frame = pd.DataFrame(frame_dict)
+        if key is not None:
+            self.disk.put(key, start, end, values,
+                          {"labels": [str(label) for label in labels]})
+
+        return columns, values
+
+    def _table_columns(self, labels):
+        """Create table columns from labels
+
+        Parameters
+        ----------
+        labels : list of str
+            labels of table columns
+
+        Returns
+        -------
+        list of dict
+            list of column dict
+        """
+
+        columns = []
+        for label in labels:
+            if label.lower() == "time":
+                columns.append({"text": label, "type": "time"})
+            else:
+                columns.append({"text": label})
+        return columns
+
+    def valget_table(self, ch_name, entity, params,
+                     starttime, endtime, labels, nturi):
+        """Get table values using pvAccess RPC
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        params : dict
+            parameters for optional RPC request query
+        starttime : str or unicode
+            start time as string
+        endtime : str or unicode
+            end time as string
+        labels : dict
+            labels for entity, starttime and endtime
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        list of dict
+            list of table values dict
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
 
-        # order of frame's columns must be labels' order for tolist
-        frame = frame[labels]
+        columns, values = self.valget_table_columns(
+            ch_name, entity, params, starttime, endtime, labels, nturi)
 
+        # interleave columns into rows in labels' order in one step
         table = [{"columns": columns,
-                  "rows": frame.values.tolist(),
+                  "rows": table_rows(values),
                   "type": "table"}]
 
         return table
 
+    def get_annotation_columns(self, ch_name, entity, params,
+                               starttime, endtime, labels, nturi):
+        """Get annotation columns using pvAccess RPC
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        params : dict
+            parameters for optional RPC request query
+        starttime : str or unicode
+            start time as string
+        endtime : str or unicode
+            end time as string
+        labels : dict
+            labels for entity, starttime and endtime
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        tuple of list
+            time as int, title, tags and text as str of annotations
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
+
+        res = self._query(ch_name, entity, params, starttime, endtime,
+                          labels, nturi)
+
+        try:
+            time = self._get_value_from_table(res, "time")
+            title = self._get_value_from_table(res, "title")
+            tags = self._get_value_from_table(res, "tags")
+            text = self._get_value_from_table(res, "text")
+            with phase("convert"):
+                time = _ints(time)
+        except InvalidRequest as e:
+            # numpy arrays of the decoded table are converted to lists
+            e.details["RPC return"] = str(_lists(res))
+            raise
+
+        with phase("convert"):
+            return time, _strs(title), _strs(tags), _strs(text)
+
     def get_annotation(self, ch_name, annotation, entity, params,
                        starttime, endtime, labels, nturi):
         """Get annotation values using pvAccess RPC
@@ -380,8 +1250,8 @@ class Pvaapi(object):
 
         Returns
         -------
-        tuple
-            tuble of value and its time
+        list of dict
+            list of annotations
 
         Raises
         ------
@@ -389,44 +1259,68 @@ class Pvaapi(object):
             if failed to call pvAccess RPC
         """
 
-        rpc = self._get_rpc_client(str(ch_name))
+        columns = self.get_annotation_columns(ch_name, entity, params,
+                                              starttime, endtime, labels,
+                                              nturi)
 
-        request = self._create_request(entity, params, starttime,
-                                       endtime, labels, ch_name, nturi)
-        try:
-            response = rpc.invoke(request, self.timeout)
-        except pva.PvaException as e:
-            raise InvalidRequest(str(e), status_code=400,
-                                 details={"request": str(request),
-                                          "ch": ch_name}
-                                 )
+        with phase("convert"):
+            annotation = str(annotation)
+            return [{"annotation": annotation,
+                     "time": tm,
+                     "title": ti,
+                     "tags": tag.split(","),
+                     "text": tex}
+                    for tm, ti, tag, tex in zip(*columns)]
 
-        if hasattr(response, "useNumPyArrays"):
-            response.useNumPyArrays = False
+    def get_annotation_json(self, ch_name, annotation, entity, params,
+                            starttime, endtime, labels, nturi):
+        """Get annotation values as JSON using pvAccess RPC
+
+        The annotations are encoded directly from the columns, which is
+        much faster than building and encoding dict for each annotation.
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        annotation : str or unicode
+            annotation to return it as is
+        entity : str or unicode
+            query entity
+        params : dict
+            parameters for optional RPC request query
+        starttime : str or unicode
+            start time as string
+        endtime : str or unicode
+            end time as string
+        labels : dict
+            labels for entity, starttime and endtime
+        nturi : bool
+            whether create request as nturi style or not
 
-        res = response.get()
+        Returns
+        -------
+        encoder.RawJSON
+            compact JSON of list of annotations with sorted keys
 
-        time = self._get_value_from_table(res, "time")
-        title = self._get_value_from_table(res, "title")
-        tags = self._get_value_from_table(res, "tags")
-        text = self._get_value_from_table(res, "text")
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
 
-        annotations = []
-        for tm, ti, tag, tex in zip(time, title, tags, text):
-            ann = {
-                    "annotation": str(annotation),
-                    "time": int(tm),
-                    "title": str(ti),
-                    "tags": str(tag).split(","),
-                    "text": str(tex)
-                  }
-            annotations.append(ann)
+        columns = self.get_annotation_columns(ch_name, entity, params,
+                                              starttime, endtime, labels,
+                                              nturi)
 
-        return annotations
+        with phase("encode"):
+            return annotations_json(annotation, *columns)
 
     def get_search(self, ch_name, entity, name, nturi):
         """Get search values using pvAccess RPC
 
+        The search index answers the search locally if it is enabled.
+
         Parameters
         ----------
         ch_name : str or unicode
@@ -449,22 +1343,75 @@ class Pvaapi(object):
             if failed to call pvAccess RPC
         """
 
-        rpc = self._get_rpc_client(str(ch_name))
+        self._check_ch_name(ch_name)
 
-        request = self._create_search_request(entity, name, ch_name, nturi)
-        try:
-            response = rpc.invoke(request, self.timeout)
-        except pva.PvaException as e:
-            raise InvalidRequest(str(e), status_code=400,
-                                 details={"request": str(request),
-                                          "ch": ch_name}
-                                 )
+        res = self.search_index.search(ch_name, entity, name, nturi)
+        if res is not None:
+            return res
+
+        return self._search_rpc(ch_name, entity, name, nturi)
+
+    def search_all(self, ch_name, name, nturi):
+        """Get all metrics for name using pvAccess RPC
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        name : str or unicoe
+            name to find metrics
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        list
+            list of all metrics
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
+
+        return self._search_rpc(ch_name, "", name, nturi)
+
+    def _search_rpc(self, ch_name, entity, name, nturi):
+        """Get search values using pvAccess RPC without search index
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        name : str or unicoe
+            name to find metrics
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        list
+            list of searched metrics
+
+        Raises
+        ------
+        InvalidRequest
+            if failed to call pvAccess RPC
+        """
+
+        with phase("build"):
+            request = self._create_search_request(entity, name, ch_name,
+                                                  nturi)
+        response = self._invoke(ch_name, request)
 
         if hasattr(response, "useNumPyArrays"):
             response.useNumPyArrays = False
 
         try:
-            res = response.getScalarArray("value")
+            with phase("decode"):
+                res = response.getScalarArray("value")
         except (pva.FieldNotFound, pva.InvalidRequest):
             current_app.logger.error("get_search: response get error")
             raise InvalidRequest("RPC returned value is invalid",
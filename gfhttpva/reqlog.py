@@ -0,0 +1,143 @@
+import atexit
+import logging
+import random
+from logging.handlers import QueueHandler, QueueListener
+from queue import Full, Queue
+
+from .metrics import LOG_DROPPED
+
+
+# QueueListener and QueueHandler of each logger started by start_listener
+_listeners = {}
+
+
+class DropQueueHandler(QueueHandler):
+    """
+    QueueHandler which drops records instead of blocking when the queue
+    is full
+    """
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            LOG_DROPPED.inc()
+
+
+def start_listener(logger, handlers, maxsize=0):
+    """Write records of logger with handlers in background thread
+
+    Records are formatted on the calling thread and put to a queue, and
+    a background thread writes them with the handlers. A listener
+    started before for the logger is stopped.
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        logger whose records are written in background
+    handlers : list of logging.Handler
+        handlers to write records
+    maxsize : int, optional
+        maximum number of queued records, 0 means unlimited
+        (default is 0)
+    """
+
+    stop_listener(logger)
+
+    queue = Queue(maxsize)
+    listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    handler = DropQueueHandler(queue)
+    listener.start()
+    logger.addHandler(handler)
+    _listeners[logger.name] = (listener, handler)
+
+
+def stop_listener(logger):
+    """Stop background thread of logger after writing queued records
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        logger whose records are written in background
+    """
+
+    item = _listeners.pop(logger.name, None)
+    if item is None:
+        return
+
+    listener, handler = item
+    logger.removeHandler(handler)
+    listener.stop()
+
+
+@atexit.register
+def _stop_all():
+    for name in list(_listeners):
+        stop_listener(logging.getLogger(name))
+
+
+class RequestLog(object):
+    """
+    Sampled log of request headers and bodies
+
+    Attributes
+    ----------
+    rate : float
+        fraction of requests to log
+    route_rates : dict
+        fraction of requests to log for URL path
+    max_body : int
+        maximum length of logged body, 0 means unlimited
+    """
+
+    def __init__(self, rate=1.0, route_rates=None, max_body=0):
+        self.rate = rate
+        self.route_rates = dict(route_rates or {})
+        self.max_body = max_body
+
+    def sampled(self, route):
+        """Decide whether request is logged
+
+        Parameters
+        ----------
+        route : str
+            URL path
+
+        Returns
+        -------
+        bool
+            whether the request is logged or not
+        """
+
+        rate = self.route_rates.get(route, self.rate)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def log(self, logger, route, headers, body):
+        """Log headers and body of request if it is sampled
+
+        Parameters
+        ----------
+        logger : logging.Logger
+            logger to log request
+        route : str
+            URL path
+        headers : obj
+            request headers
+        body : obj
+            parsed request body
+        """
+
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        if not self.sampled(route):
+            return
+
+        body = str(body)
+        if self.max_body and len(body) > self.max_body:
+            body = "%s... (%d chars)" % (body[:self.max_body], len(body))
+
+        logger.info(headers)
+        logger.info(body)
+
+
+REQUEST_LOG = RequestLog()
@@ -0,0 +1,181 @@
+import time
+from bisect import bisect_left
+from threading import Event, Lock, Thread
+
+
+MODES = ("prefix", "substring")
+
+
+class _Entry(object):
+    """
+    Metric names of one search channel and name
+
+    Attributes
+    ----------
+    values : list of str
+        metric names in the order returned by RPC
+    keys : list of str
+        sorted metric names
+    positions : list of int
+        position in values of each sorted metric name
+    last_used : float
+        time of the last search by time.monotonic
+    """
+
+    def __init__(self, values):
+        self.values = [str(value) for value in values]
+        order = sorted(range(len(self.values)),
+                       key=self.values.__getitem__)
+        self.keys = [self.values[i] for i in order]
+        self.positions = order
+        self.last_used = time.monotonic()
+
+    def prefix(self, query):
+        lo = bisect_left(self.keys, query)
+        hi = lo
+        while hi < len(self.keys) and self.keys[hi].startswith(query):
+            hi += 1
+        return [self.values[i] for i in sorted(self.positions[lo:hi])]
+
+    def substring(self, query):
+        return [value for value in self.values if query in value]
+
+
+class SearchIndex(object):
+    """
+    Local index of metric names for search requests
+
+    The full list of metric names for a channel and name is fetched
+    once with an empty query and searched locally. Fetched lists are
+    refreshed in a background thread and dropped when they are not
+    searched for a while.
+
+    Attributes
+    ----------
+    fetch : callable
+        function of (ch_name, name, nturi) to fetch full list of metric
+        names
+    mode : str or None
+        "prefix" or "substring" to match metric names as the RPC server
+        does, None disables the index
+    refresh : float
+        interval in seconds to refresh lists
+    expire : float
+        time in seconds after which lists not searched are dropped
+    app : flask.Flask
+        application whose context is used in the background thread
+    _entries : dict
+        _Entry for (ch_name, name, nturi)
+    _lock : threading.Lock
+        lock for _entries
+    _stop : threading.Event
+        event to stop the background thread
+    _thread : threading.Thread
+        background thread to refresh lists
+    """
+
+    def __init__(self, fetch=None, mode=None, refresh=300, expire=3600,
+                 app=None):
+        self.fetch = fetch
+        self.mode = mode
+        self.refresh = refresh
+        self.expire = expire
+        self.app = app
+        self._entries = {}
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def search(self, ch_name, entity, name, nturi):
+        """Search metric names in the index
+
+        Parameters
+        ----------
+        ch_name : str or unicode
+            channel name of pvAccess RPC
+        entity : str or unicode
+            query entity
+        name : str or unicode
+            name to find metrics
+        nturi : bool
+            whether create request as nturi style or not
+
+        Returns
+        -------
+        list
+            list of searched metrics or None if the list can not be
+            fetched
+        """
+
+        if self.mode not in MODES:
+            return None
+
+        key = (str(ch_name), str(name), bool(nturi))
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            try:
+                entry = self._load(key)
+            except Exception:
+                return None
+
+        entry.last_used = time.monotonic()
+        query = str(entity)
+        if self.mode == "prefix":
+            return entry.prefix(query)
+        return entry.substring(query)
+
+    def stop(self):
+        """Stop the background thread"""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _load(self, key):
+        entry = _Entry(self.fetch(*key))
+        with self._lock:
+            self._entries[key] = entry
+            if self._thread is None and self.refresh:
+                self._thread = Thread(target=self._run,
+                                      name="gfhttpva-search", daemon=True)
+                self._thread.start()
+        return entry
+
+    def _run(self):
+        while not self._stop.wait(self.refresh):
+            if self.app is not None:
+                with self.app.app_context():
+                    self._refresh()
+            else:
+                self._refresh()
+
+    def _refresh(self):
+        expiry = time.monotonic() - self.expire
+        with self._lock:
+            keys = list(self._entries)
+
+        for key in keys:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry.last_used < expiry:
+                with self._lock:
+                    self._entries.pop(key, None)
+                continue
+
+            try:
+                new_entry = _Entry(self.fetch(*key))
+            except Exception:
+                # keep the current list until the next refresh
+                continue
+            new_entry.last_used = entry.last_used
+            with self._lock:
+                if key in self._entries:
+                    self._entries[key] = new_entry
@@ -0,0 +1,370 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+
+class Segments(object):
+    """
+    Timeseries of one series with time intervals already fetched
+
+    Attributes
+    ----------
+    intervals : list of list
+        sorted and disjoint [start, end] intervals in milliseconds
+    time : numpy.ndarray
+        sorted time of datapoints in milliseconds
+    value : numpy.ndarray
+        value of datapoints
+    """
+
+    def __init__(self):
+        self.intervals = []
+        self.time = np.empty(0)
+        self.value = np.empty(0)
+
+    def missing(self, start, end):
+        """Get time intervals which are not fetched yet
+
+        Parameters
+        ----------
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
+
+        Returns
+        -------
+        list of tuple
+            (start, end) intervals in milliseconds
+        """
+
+        missing = []
+        for i_start, i_end in self.intervals:
+            if i_end < start:
+                continue
+            if i_start > end:
+                break
+            if i_start > start:
+                missing.append((start, i_start))
+            start = max(start, i_end)
+            if start >= end:
+                return missing
+
+        missing.append((start, end))
+        return missing
+
+    def add(self, start, end, covered_end, time, value):
+        """Add datapoints fetched for time interval
+
+        Datapoints within the interval are replaced by the new ones and
+        the new datapoints out of the interval are ignored.
+
+        Parameters
+        ----------
+        start : int
+            start time of fetched interval in milliseconds
+        end : int
+            end time of fetched interval in milliseconds
+        covered_end : int
+            end time in milliseconds up to which datapoints are final
+        time : numpy.ndarray
+            time of datapoints in milliseconds
+        value : numpy.ndarray
+            value of datapoints
+        """
+
+        # the fetched window may be wider than the interval
+        inside = (time >= start) & (time <= end)
+        time, value = time[inside], value[inside]
+        if len(self.time):
+            keep = (self.time < start) | (self.time > end)
+            new_time = np.concatenate((self.time[keep], time))
+            new_value = np.concatenate((self.value[keep], value))
+        else:
+            new_time, new_value = time, value
+        order = np.argsort(new_time, kind="stable")
+        self.time = new_time[order]
+        self.value = new_value[order]
+
+        if covered_end < start:
+            return
+
+        intervals = []
+        i_new = [start, min(end, covered_end)]
+        for interval in self.intervals:
+            if interval[1] < i_new[0] or interval[0] > i_new[1]:
+                intervals.append(interval)
+            else:
+                i_new = [min(interval[0], i_new[0]),
+                         max(interval[1], i_new[1])]
+        intervals.append(i_new)
+        intervals.sort()
+        self.intervals = intervals
+
+    def get(self, start, end):
+        """Get datapoints within time interval
+
+        Parameters
+        ----------
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            time and value of datapoints
+        """
+
+        lo = np.searchsorted(self.time, start, side="left")
+        hi = np.searchsorted(self.time, end, side="right")
+        return self.time[lo:hi], self.value[lo:hi]
+
+    def truncate(self, maxpoints):
+        """Drop oldest datapoints to keep the number of datapoints
+
+        Parameters
+        ----------
+        maxpoints : int
+            maximum number of datapoints
+
+        Returns
+        -------
+        int
+            time in milliseconds up to which datapoints may have been
+            dropped or None if no datapoint is dropped
+        """
+
+        if len(self.time) <= maxpoints:
+            return None
+
+        drop = len(self.time) - maxpoints
+        first = self.time[drop]
+        self.time = self.time[drop:]
+        self.value = self.value[drop:]
+        # datapoints equal to first may have been dropped
+        self.intervals = [[max(i_start, first + 1), i_end]
+                          for i_start, i_end in self.intervals
+                          if i_end > first]
+        return int(first)
+
+
+class SegmentStore(object):
+    """
+    Store of fetched timeseries segments to fetch only missing ranges
+
+    Attributes
+    ----------
+    maxsize : int
+        maximum number of stored series, 0 disables the store
+    maxpoints : int
+        maximum number of datapoints for one series
+    lag : float
+        time in seconds before now whose datapoints may be incomplete
+    disk : diskcache.DiskCache or None
+        on-disk cache to persist final datapoints and load series which
+        are not in memory
+    max_files : int
+        number of segment files of one series in the disk cache after
+        which they are merged
+    _data : collections.OrderedDict
+        Segments for series key in LRU order
+    _lock : threading.Lock
+        lock for _data
+    """
+
+    def __init__(self, maxsize=0, maxpoints=1000000, lag=10, disk=None,
+                 max_files=16):
+        self.maxsize = maxsize
+        self.maxpoints = maxpoints
+        self.lag = lag
+        self.disk = disk
+        self.max_files = max_files
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def covered_end(self):
+        """Get end time up to which fetched datapoints are final
+
+        Returns
+        -------
+        int
+            end time in milliseconds
+        """
+
+        return int((time.time() - self.lag) * 1000)
+
+    def missing(self, key, start, end):
+        """Get time intervals of series which are not fetched yet
+
+        Parameters
+        ----------
+        key : tuple
+            key of series
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
+
+        Returns
+        -------
+        list of tuple
+            (start, end) intervals in milliseconds
+        """
+
+        with self._lock:
+            segments = self._data.get(key)
+            if segments is not None:
+                return segments.missing(start, end)
+
+        if not self._load(key):
+            return [(start, end)]
+
+        with self._lock:
+            segments = self._data.get(key)
+            if segments is None:
+                return [(start, end)]
+            return segments.missing(start, end)
+
+    def add(self, key, start, end, time_ms, value):
+        """Add datapoints of series fetched for time interval
+
+        Parameters
+        ----------
+        key : tuple
+            key of series
+        start : int
+            start time of fetched interval in milliseconds
+        end : int
+            end time of fetched interval in milliseconds
+        time_ms : numpy.ndarray
+            time of datapoints in milliseconds
+        value : numpy.ndarray
+            value of datapoints
+
+        Returns
+        -------
+        bool
+            whether all the datapoints are kept in the store or not
+        """
+
+        if not self.maxsize:
+            return False
+
+        covered_end = self.covered_end()
+
+        with self._lock:
+            segments = self._data.get(key)
+            if segments is None:
+                segments = self._data[key] = Segments()
+            self._data.move_to_end(key)
+
+            segments.add(start, end, covered_end, np.asarray(time_ms),
+                         np.asarray(value))
+            dropped = segments.truncate(self.maxpoints)
+            kept = dropped is None or dropped < start
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+            final_end = min(end, covered_end)
+            if self.disk is None or final_end < start or not kept:
+                return kept
+            final = segments.get(start, final_end)
+
+        # final datapoints are persisted out of the lock
+        if self.disk.put(key, start, final_end, final) > self.max_files:
+            self._compact(key)
+        return kept
+
+    def get(self, key, start, end, covered_end=None):
+        """Get datapoints of series within time interval
+
+        Parameters
+        ----------
+        key : tuple
+            key of series
+        start : int
+            start time in milliseconds
+        end : int
+            end time in milliseconds
+        covered_end : int, optional
+            end time in milliseconds up to which the interval must be
+            fetched (default is None to not check it)
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            time and value of datapoints or None if series is not stored
+            or the interval up to covered_end is not fetched
+        """
+
+        with self._lock:
+            segments = self._data.get(key)
+            if segments is None:
+                return None
+            if (covered_end is not None and covered_end >= start and
+                    segments.missing(start, min(end, covered_end))):
+                return None
+            self._data.move_to_end(key)
+            return segments.get(start, end)
+
+    def _load(self, key):
+        """Load series from the disk cache
+
+        Parameters
+        ----------
+        key : tuple
+            key of series
+
+        Returns
+        -------
+        bool
+            whether the series is loaded or not
+        """
+
+        if self.disk is None or not self.maxsize:
+            return False
+
+        entries = self.disk.get(key)
+        if not entries:
+            return False
+
+        segments = Segments()
+        for start, end, (time_ms, value), _ in entries:
+            segments.add(start, end, end, time_ms, value)
+        segments.truncate(self.maxpoints)
+
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = segments
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return True
+
+    def _compact(self, key):
+        """Merge segment files of series in the disk cache
+
+        Parameters
+        ----------
+        key : tuple
+            key of series
+        """
+
+        with self._lock:
+            segments = self._data.get(key)
+            if segments is None:
+                return
+            merged = [(i_start, i_end, segments.get(i_start, i_end))
+                      for i_start, i_end in segments.intervals]
+
+        # datapoints truncated from memory are dropped from the disk too
+        self.disk.replace(key, [(i_start, i_end, list(series))
+                                for i_start, i_end, series in merged])
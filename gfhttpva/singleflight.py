@@ -0,0 +1,70 @@
+from concurrent.futures import Future
+from threading import Lock
+
+
+class SingleFlight(object):
+    """
+    Coalescer of identical calls in flight
+
+    The first caller for a key runs the call and concurrent callers for
+    the same key wait for and share its result or exception.
+
+    Attributes
+    ----------
+    _calls : dict
+        concurrent.futures.Future of calls in flight for key
+    _lock : threading.Lock
+        lock for _calls
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, func, timeout=None):
+        """Run func once for concurrent callers with the same key
+
+        Parameters
+        ----------
+        key : hashable
+            key of the call
+        func : callable
+            function without arguments to run
+        timeout : float, optional
+            timeout in seconds to wait for the call by other caller
+            (default is None)
+
+        Returns
+        -------
+        obj
+            result of func
+
+        Raises
+        ------
+        concurrent.futures.TimeoutError
+            if the call by other caller does not finish within timeout
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(timeout)
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
@@ -1,5 +1,10 @@
+import calendar
+from datetime import datetime
+
 import pytz
 
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
 
 class timezone(object):
     """
@@ -44,3 +49,43 @@ class timezone(object):
         """
 
         return self.tz
+
+    def to_ms(self, time_str):
+        """Convert time string in this timezone to unixtime in milliseconds
+
+        Parameters
+        ----------
+        time_str : str
+            time string formatted as "%Y-%m-%dT%H:%M:%S"
+
+        Returns
+        -------
+        int
+            unixtime in milliseconds
+        """
+
+        dt = self.tz.localize(datetime.strptime(str(time_str), TIME_FORMAT))
+        return calendar.timegm(dt.utctimetuple()) * 1000
+
+    def from_ms(self, time_ms, ceil=False):
+        """Convert unixtime in milliseconds to time string in this timezone
+
+        Parameters
+        ----------
+        time_ms : int
+            unixtime in milliseconds
+        ceil : bool
+            whether round up to seconds or round down
+
+        Returns
+        -------
+        str
+            time string formatted as "%Y-%m-%dT%H:%M:%S"
+        """
+
+        seconds = -(-int(time_ms) // 1000) if ceil else int(time_ms) // 1000
+        dt = datetime.fromtimestamp(seconds, self.tz)
+        return dt.strftime(TIME_FORMAT)
+
+
+TIMEZONE = timezone()
@@ -0,0 +1,130 @@
+import time
+import contextvars
+from contextlib import contextmanager
+from threading import Lock
+
+
+_timings = contextvars.ContextVar("gfhttpva_timings", default=None)
+
+
+class Timings(object):
+    """
+    Elapsed time of phases in one request
+
+    Time of the same phase is summed, so phases of pvAccess RPC calls
+    running concurrently can exceed the total time.
+
+    Attributes
+    ----------
+    start_time : float
+        start time of request by time.perf_counter
+    _phases : dict
+        elapsed time in seconds for phase name in order of first record
+    _lock : threading.Lock
+        lock for _phases
+    """
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self._phases = {}
+        self._lock = Lock()
+
+    def add(self, name, duration):
+        """Add elapsed time of phase
+
+        Parameters
+        ----------
+        name : str
+            phase name
+        duration : float
+            elapsed time in seconds
+        """
+
+        with self._lock:
+            self._phases[name] = self._phases.get(name, 0) + duration
+
+    def items(self):
+        """Get elapsed time of phases and total time
+
+        Returns
+        -------
+        list of tuple
+            (phase name, elapsed time in milliseconds)
+        """
+
+        total = time.perf_counter() - self.start_time
+        with self._lock:
+            phases = list(self._phases.items())
+        phases.append(("total", total))
+        return [(name, round(duration * 1000, 3))
+                for name, duration in phases]
+
+    def header(self):
+        """Get value of Server-Timing header
+
+        Returns
+        -------
+        str
+            Server-Timing header value
+        """
+
+        return ", ".join("%s;dur=%s" % (name, duration)
+                         for name, duration in self.items())
+
+
+def start():
+    """Start timings for the current context
+
+    Returns
+    -------
+    contextvars.Token
+        token to reset the timings with stop
+    """
+
+    return _timings.set(Timings())
+
+
+def stop(token):
+    """Stop timings started with start
+
+    Parameters
+    ----------
+    token : contextvars.Token
+        token returned by start
+    """
+
+    _timings.reset(token)
+
+
+def current():
+    """Get timings for the current context
+
+    Returns
+    -------
+    Timings
+        timings or None if timings are not started
+    """
+
+    return _timings.get()
+
+
+@contextmanager
+def phase(name):
+    """Measure elapsed time of phase for the current timings
+
+    Parameters
+    ----------
+    name : str
+        phase name
+    """
+
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start_time)
@@ -19,11 +19,14 @@ setup(
     include_package_data=True,
     zip_safe=False,
     install_requires=[
-        'flask',
+        'flask>=2.3',
         'flask-cors',
         'numpy',
-        'pandas',
         'pytz',
         'pvapy',
     ],
+    extras_require={
+        'fast': ['orjson'],
+        'brotli': ['brotli'],
+    },
 )
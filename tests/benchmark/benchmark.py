@@ -0,0 +1,326 @@
+"""End-to-end throughput benchmark of gfhttpva
+
+The benchmark starts the test pvAccess RPC server in a subprocess and
+drives the Flask application created by create_app with test clients at
+fixed concurrency. Each scenario runs in its own process, so the peak
+RSS of a scenario is not the maximum of the scenarios before it. Results
+are written as JSON to compare versions, e.g.
+
+    python tests/benchmark/benchmark.py --length 10000 --output res.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import threading
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+
+from gfhttpva import create_app  # noqa: E402
+
+SERVER = os.path.join(ROOT, "tests", "pvaserver", "run.py")
+RANGE = {"from": "2018-01-01T00:00:00.000Z",
+         "to": "2018-01-01T06:00:00.000Z"}
+ENTITIES = ["long", "float", "string"]
+
+
+def json_data(prefix, ch):
+    """Create jsonData of datasource
+
+    Parameters
+    ----------
+    prefix : str
+        prefix of RPC channel names
+    ch : str
+        RPC channel name without prefix
+
+    Returns
+    -------
+    dict
+        jsonData of datasource
+    """
+
+    return {"ch": prefix + ch, "entity_label": "entity",
+            "start_label": "starttime", "end_label": "endtime",
+            "nturi_style": False}
+
+
+def scenarios(prefix, targets):
+    """Create requests of benchmark scenarios
+
+    Parameters
+    ----------
+    prefix : str
+        prefix of RPC channel names
+    targets : int
+        number of targets of timeserie query
+
+    Returns
+    -------
+    list of tuple
+        (name, URL path, request body) of scenarios
+    """
+
+    timeserie = [{"target": ENTITIES[i % len(ENTITIES)],
+                  "refId": str(i), "type": "timeserie",
+                  "params": {"param1": str(i)}}
+                 for i in range(targets)]
+
+    return [
+        ("query_timeserie", "/query",
+         {"range": RANGE, "targets": timeserie,
+          "jsonData": json_data(prefix, "get")}),
+        ("query_table", "/query",
+         {"range": RANGE,
+          "targets": [{"target": "table", "refId": "A", "type": "table"}],
+          "jsonData": json_data(prefix, "get")}),
+        ("annotations", "/annotations",
+         {"range": RANGE,
+          "annotation": {"entity": "bench", "name": "bench"},
+          "jsonData": json_data(prefix, "annotation")}),
+        ("search", "/search",
+         {"ch": prefix + "search", "target": "", "name": "entity",
+          "nturi_style": False}),
+    ]
+
+
+def start_server(prefix, length, table_rows):
+    """Start test pvAccess RPC server in subprocess
+
+    Parameters
+    ----------
+    prefix : str
+        prefix of RPC channel names
+    length : int
+        number of datapoints of timeseries
+    table_rows : int
+        number of rows of table
+
+    Returns
+    -------
+    subprocess.Popen
+        server process
+    """
+
+    cmd = [sys.executable, SERVER, "--prefix", prefix,
+           "--length", str(length), "--table-rows", str(table_rows)]
+    return subprocess.Popen(cmd, cwd=os.path.dirname(SERVER),
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+
+
+def wait_server(app, prefix, timeout=10):
+    """Wait until the server responds to search request
+
+    Parameters
+    ----------
+    app : flask.Flask
+        gfhttpva application
+    prefix : str
+        prefix of RPC channel names
+    timeout : float, optional
+        timeout in seconds (default is 10)
+
+    Raises
+    ------
+    RuntimeError
+        if the server does not respond within timeout
+    """
+
+    body = {"ch": prefix + "search", "target": "", "name": "entity",
+            "nturi_style": False}
+    client = app.test_client()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.post("/search", json=body).status_code == 200:
+            return
+        time.sleep(0.2)
+    raise RuntimeError("pvAccess RPC server did not start")
+
+
+def run_scenario(app, path, body, requests, concurrency, warmup=None):
+    """Send requests at fixed concurrency and measure latency
+
+    Warm-up requests are sent by the clients concurrently before the
+    measurement, so connecting channels and creating pooled RPC clients
+    are not included in the results.
+
+    Parameters
+    ----------
+    app : flask.Flask
+        gfhttpva application
+    path : str
+        URL path
+    body : dict
+        request body
+    requests : int
+        total number of requests
+    concurrency : int
+        number of concurrent clients
+    warmup : int, optional
+        number of warm-up requests (default is None to send concurrency
+        requests)
+
+    Returns
+    -------
+    dict
+        throughput, latency percentiles, errors and peak RSS of the
+        process
+    """
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+    warmups = iter(range(concurrency if warmup is None else warmup))
+    begin = threading.Barrier(concurrency)
+    ready = threading.Barrier(concurrency + 1)
+
+    def worker():
+        client = app.test_client()
+        # clients start warm-up together to create pooled RPC clients
+        begin.wait()
+        while True:
+            with lock:
+                if next(warmups, None) is None:
+                    break
+            client.post(path, json=body).get_data()
+        ready.wait()
+
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            start = time.perf_counter()
+            rv = client.post(path, json=body)
+            rv.get_data()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if rv.status_code != 200:
+                    errors.append(rv.status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000).tolist()
+    return {"requests": requests, "concurrency": concurrency,
+            "errors": len(errors), "seconds": round(wall, 4),
+            "rps": round(requests / wall, 2),
+            "p50_ms": round(p50, 3), "p95_ms": round(p95, 3),
+            "p99_ms": round(p99, 3),
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def run_process(args, name):
+    """Run scenario in a new process
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        command line arguments
+    name : str
+        scenario name
+
+    Returns
+    -------
+    dict
+        result of run_scenario
+    """
+
+    cmd = [sys.executable, os.path.abspath(__file__), "--run", name,
+           "--prefix", args.prefix, "--targets", str(args.targets),
+           "--requests", str(args.requests),
+           "--concurrency", str(args.concurrency), "--config", args.config]
+    if args.warmup is not None:
+        cmd += ["--warmup", str(args.warmup)]
+    res = subprocess.run(cmd, stdout=subprocess.PIPE, check=True)
+    return json.loads(res.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gfhttpva benchmark")
+    parser.add_argument("--prefix", default="GFHTTPVA:BENCH:",
+                        help="prefix of RPC channel names")
+    parser.add_argument("--length", type=int, default=10000,
+                        help="number of datapoints of timeseries")
+    parser.add_argument("--table-rows", type=int, default=10000,
+                        help="number of rows of table")
+    parser.add_argument("--targets", type=int, default=4,
+                        help="number of targets of timeserie query")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="number of requests for each scenario")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="number of concurrent clients")
+    parser.add_argument("--warmup", type=int,
+                        help="number of warm-up requests excluded from "
+                             "results (default is concurrency)")
+    parser.add_argument("--scenario", action="append",
+                        help="scenario to run (default is all)")
+    parser.add_argument("--config", default="gfhttpva.config.DefaultConfig",
+                        help="python path to config object")
+    parser.add_argument("--output", help="path to JSON result file")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # child process of run_process with the server already started
+        app = create_app(args.config)
+        app.logger.disabled = True
+        wait_server(app, args.prefix)
+        for name, path, body in scenarios(args.prefix, args.targets):
+            if name == args.run:
+                print(json.dumps(run_scenario(app, path, body,
+                                              args.requests,
+                                              args.concurrency,
+                                              args.warmup)))
+        return
+
+    server = start_server(args.prefix, args.length, args.table_rows)
+    try:
+        results = {}
+        for name, path, body in scenarios(args.prefix, args.targets):
+            if args.scenario and name not in args.scenario:
+                continue
+            results[name] = run_process(args, name)
+            print("%s: %s" % (name, results[name]), file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "params": {"length": args.length,
+                         "table_rows": args.table_rows,
+                         "targets": args.targets,
+                         "requests": args.requests,
+                         "concurrency": args.concurrency,
+                         "warmup": (args.concurrency if args.warmup is None
+                                    else args.warmup),
+                         "config": args.config},
+              "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,17 @@ import sys
 
 import gfhttpva
 from gfhttpva import create_app
+from gfhttpva import asgi
+from gfhttpva import metrics
+from gfhttpva import timing
+from gfhttpva import clientpool
+from gfhttpva import breaker
+from gfhttpva import searchindex
+from gfhttpva import compress
+from gfhttpva import etag
+from gfhttpva import reqlog
+from gfhttpva import diskcache
+from gfhttpva import prewarm
 from gfhttpva import config
 from gfhttpva.gfhttpva import TIMEZONE
 from gfhttpva.pvaapi import pvaapi
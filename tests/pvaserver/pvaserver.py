@@ -14,7 +14,9 @@ TYPES = {"long": pva.LONG, "float": pva.FLOAT, "string": pva.STRING}
 
 class PvaServer():
 
-    def __init__(self, prefix=""):
+    def __init__(self, prefix="", length=3, table_rows=3):
+        self.length = length
+        self.table_rows = table_rows
         self.srv = pva.RpcServer()
         self.srv.registerService(prefix + "get", self.get)
         self.srv.registerService(prefix + "search", self.search)
@@ -59,12 +61,12 @@ class PvaServer():
         return table
 
     def get_timesrie(self, entity, str_sec, end_sec, param1):
-        interval = (end_sec - str_sec)//2
+        interval = (end_sec - str_sec)//max(self.length - 1, 1)
 
         value = []
         seconds = []
         nano = []
-        for i in range(3):
+        for i in range(self.length):
             if entity == "string" or entity == "str":
                 value.append(str(param1+i))
             else:
@@ -99,6 +101,16 @@ class PvaServer():
         time = ["2016-04-04T08:10:14", "2016-04-04T08:10:15",
                 "2016-04-04T08:10:16"]
 
+        if self.table_rows != 3:
+            rows = range(self.table_rows)
+            value = [1.1 + i for i in rows]
+            seconds = [1460589140 + i for i in rows]
+            nano = [164235245 + i for i in rows]
+            status = [i % 2 for i in rows]
+            severity = [i % 4 for i in rows]
+            time = [datetime.fromtimestamp(sec, pytz.utc)
+                    .strftime("%Y-%m-%dT%H:%M:%S") for sec in seconds]
+
         vals = {"column0": [pva.DOUBLE],
                 "column1": [pva.ULONG],
                 "column2": [pva.ULONG],
@@ -1,10 +1,20 @@
 import time
+import argparse
 
 from pvaserver import PvaServer
 
 
 def main():
-    srv = PvaServer("ET_SASAKI:GFHTTPVA:TEST:")
+    parser = argparse.ArgumentParser(description="Test pvAccess RPC server")
+    parser.add_argument("--prefix", default="ET_SASAKI:GFHTTPVA:TEST:",
+                        help="prefix of RPC channel names")
+    parser.add_argument("--length", type=int, default=3,
+                        help="number of datapoints of timeseries")
+    parser.add_argument("--table-rows", type=int, default=3,
+                        help="number of rows of table")
+    args = parser.parse_args()
+
+    srv = PvaServer(args.prefix, args.length, args.table_rows)
     try:
         srv.run()
         while(True):
@@ -0,0 +1,138 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from .context import asgi
+
+
+@pytest.fixture
+def asgi_app():
+    return asgi.create_asgi_app("gfhttpva.config.TestingConfig")
+
+
+@pytest.fixture
+def query():
+    return {
+             "range": {
+               "from": "2018-01-01T00:00:00.000Z",
+               "to": "2018-01-01T06:00:00.000Z",
+             },
+             "targets": [{"target": "long", "refId": "A",
+                          "type": "timeserie"}],
+             "jsonData": {
+                "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                "entity_label": "entity",
+                "start_label": "starttime",
+                "end_label": "endtime",
+                "nturi_style": False
+             }
+           }
+
+
+def request(app, path, body=None, method="POST", headers=()):
+    headers = list(headers)
+    if body:
+        headers.append((b"content-type", b"application/json"))
+    scope = {"type": "http", "path": path, "method": method,
+             "headers": headers}
+    messages = [{"type": "http.request",
+                 "body": json.dumps(body).encode() if body else b""}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+
+    start = sent[0]
+    headers = dict(start["headers"])
+    data = b"".join(message.get("body", b"") for message in sent[1:])
+    return start["status"], headers, data
+
+
+def test_asgi_root(asgi_app):
+    status, headers, data = request(asgi_app, "/", method="GET")
+    assert status == 200
+    assert data == b"pvaccess python Grafana datasource"
+
+
+def test_asgi_not_found(asgi_app):
+    status, headers, data = request(asgi_app, "/unknown")
+    assert status == 404
+
+
+def test_asgi_query(asgi_app, query):
+    status, headers, data = request(asgi_app, "/query", query)
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert b"rpc;dur=" in headers[b"server-timing"]
+
+    client = asgi_app.app.test_client()
+    assert data == client.post("/query", json=query).get_data()
+
+
+def test_asgi_query_table_stream(asgi_app, query):
+    query["targets"] = [{"target": "table", "refId": "A", "type": "table"}]
+    client = asgi_app.app.test_client()
+    expected = client.post("/query", json=query).get_data()
+
+    asgi_app.app.config["TABLE_STREAM_BATCH"] = 2
+    status, headers, data = request(asgi_app, "/query", query)
+    assert status == 200
+    assert b"content-length" not in headers
+    assert data == expected
+
+
+def test_asgi_query_error(asgi_app, query):
+    query["jsonData"]["ch"] = ""
+    status, headers, data = request(asgi_app, "/query", query)
+    assert status == 400
+    assert json.loads(data) == {"message": "RPC ch name is empty",
+                                "details": {}}
+
+
+def test_asgi_cors_preflight(asgi_app):
+    headers = [(b"origin", b"http://localhost:3000"),
+               (b"access-control-request-method", b"POST"),
+               (b"access-control-request-headers", b"content-type")]
+    status, headers, data = request(asgi_app, "/query", method="OPTIONS",
+                                    headers=headers)
+    assert status == 200
+    assert headers[b"access-control-allow-origin"] == \
+        b"http://localhost:3000"
+    assert headers[b"access-control-allow-headers"] == b"content-type"
+    assert headers[b"access-control-max-age"] == b"600"
+
+
+def test_asgi_gzip(asgi_app, query):
+    asgi_app.app.config["COMPRESS_ENCODINGS"] = ["gzip"]
+    asgi_app.app.config["COMPRESS_MIN_SIZE"] = 0
+    _, headers, expected = request(asgi_app, "/query", query)
+    status, headers, data = request(asgi_app, "/query", query,
+                                    headers=[(b"accept-encoding", b"gzip")])
+    assert status == 200
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert gzip.decompress(data) == expected
+
+
+def test_asgi_not_modified(asgi_app, query):
+    status, headers, data = request(asgi_app, "/query", query)
+    tag = headers[b"etag"]
+    status, headers, data = request(asgi_app, "/query", query,
+                                    headers=[(b"if-none-match", tag)])
+    assert status == 304
+    assert headers[b"etag"] == tag
+    assert data == b""
+
+
+def test_asgi_metrics(asgi_app, query):
+    request(asgi_app, "/query", query)
+    status, headers, data = request(asgi_app, "/metrics", method="GET")
+    assert status == 200
+    assert b'route="/query"' in data
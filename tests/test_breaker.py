@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from .context import breaker, clientpool, pvaapi
+
+
+def test_breaker_open():
+    cb = breaker.CircuitBreaker(threshold=2, reset_timeout=10)
+    assert cb.allow("a")
+    cb.failure("a")
+    assert cb.state("a") == breaker.CLOSED
+    assert cb.allow("a")
+    cb.failure("a")
+    assert cb.state("a") == breaker.OPEN
+    assert not cb.allow("a")
+    assert cb.retry_after("a") > 9
+    assert cb.allow("b")
+
+
+def test_breaker_success_resets_failures():
+    cb = breaker.CircuitBreaker(threshold=2)
+    cb.failure("a")
+    cb.success("a")
+    cb.failure("a")
+    assert cb.state("a") == breaker.CLOSED
+
+
+def test_breaker_half_open():
+    cb = breaker.CircuitBreaker(threshold=1, reset_timeout=0.05)
+    cb.failure("a")
+    time.sleep(0.1)
+
+    assert cb.allow("a")
+    assert cb.state("a") == breaker.HALF_OPEN
+    assert not cb.allow("a")
+    cb.failure("a")
+    assert cb.state("a") == breaker.OPEN
+
+    time.sleep(0.1)
+    assert cb.allow("a")
+    cb.cancel("a")
+    assert cb.allow("a")
+    cb.success("a")
+    assert cb.state("a") == breaker.CLOSED
+
+
+def test_breaker_maxsize():
+    cb = breaker.CircuitBreaker(threshold=1, maxsize=2)
+    cb.failure("a")
+    cb.failure("b")
+    cb.failure("a")
+    cb.failure("c")
+    assert len(cb._states) == 2
+    assert cb.state("a") == breaker.OPEN
+    assert cb.state("b") == breaker.CLOSED
+    assert cb.state("c") == breaker.OPEN
+
+
+def test_breaker_disabled():
+    cb = breaker.CircuitBreaker(threshold=0)
+    for _ in range(10):
+        cb.failure("a")
+    assert cb.allow("a")
+
+
+def test_query_open_circuit(app):
+    pvaapi.breaker = breaker.CircuitBreaker(threshold=1, reset_timeout=60)
+    query = {"ch": "NOT:EXIST:CH", "target": "", "name": "entity",
+             "nturi_style": False}
+    client = app.test_client()
+
+    rv = client.post("/search", json=query)
+    assert rv.get_json()["message"] == "connection timeout"
+
+    start = time.monotonic()
+    rv = client.post("/search", json=query)
+    assert time.monotonic() - start < 0.5
+    assert rv.status_code == 503
+    json_data = rv.get_json()
+    assert json_data["message"] == "RPC channel is unavailable"
+    assert json_data["details"]["ch"] == "NOT:EXIST:CH"
+
+
+def test_half_open_unexpected_error(monkeypatch):
+    class Client(object):
+        def __init__(self, name):
+            pass
+
+        def invoke(self, request, timeout):
+            raise RuntimeError("unexpected")
+
+    cb = breaker.CircuitBreaker(threshold=1, reset_timeout=0.05)
+    monkeypatch.setattr(pvaapi, "breaker", cb)
+    monkeypatch.setattr(pvaapi, "clients", clientpool.ClientPool(
+        factory=Client))
+    cb.failure("CH")
+    time.sleep(0.1)
+
+    with pytest.raises(RuntimeError):
+        pvaapi._invoke("CH", None)
+    # the probe slot is released for the next call
+    assert cb.allow("CH")
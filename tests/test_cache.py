@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import subprocess
+
+import numpy as np
+
+from .context import gfhttpva
+from .context import config
+from .context import pvaapi
+from gfhttpva.cache import ResultCache, fingerprint
+from gfhttpva.diskcache import DiskCache
+
+
+class CacheConfig(config.TestingConfig):
+    PVA_CACHE_SIZE = 10
+
+
+def key(entity, starttime="2018-01-01T09:00:00"):
+    labels = {"entity": "entity", "start": "starttime", "end": "endtime"}
+    return fingerprint("rpc", "CH", entity, {"param1": 0}, starttime,
+                       "2018-01-01T15:00:00", labels, False)
+
+
+def test_fingerprint():
+    labels = {"entity": "entity", "start": "starttime", "end": "endtime"}
+    key1 = fingerprint("rpc", "CH", "long", {"a": 1, "b": "2"},
+                       "start", "end", labels, False)
+    key2 = fingerprint("rpc", "CH", "long", {"b": 2, "a": "1"},
+                       "start", "end", labels, False)
+    assert key1 == key2
+    assert key("long") != key("long", "2018-01-01T09:00:01")
+
+
+def test_cache_lru():
+    cache = ResultCache(2, 10)
+    cache.put(key("a"), "CH", 1)
+    cache.put(key("b"), "CH", 2)
+    assert cache.get(key("a")) == 1
+    cache.put(key("c"), "CH", 3)
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == 1
+    assert cache.get(key("c")) == 3
+    assert len(cache) == 2
+    assert cache.hits == 3
+    assert cache.misses == 1
+
+
+def test_cache_ttl():
+    cache = ResultCache(2, 0.01, {"NO:CACHE:CH": 0})
+    cache.put(key("a"), "CH", 1)
+    cache.put(key("b"), "NO:CACHE:CH", 2)
+    assert cache.get(key("a")) == 1
+    assert cache.get(key("b")) is None
+    time.sleep(0.02)
+    assert cache.get(key("a")) is None
+    assert len(cache) == 0
+
+
+def test_cache_disabled():
+    cache = ResultCache(0, 10)
+    cache.put(key("a"), "CH", 1)
+    assert cache.get(key("a")) is None
+    assert cache.misses == 0
+
+
+def test_query_cache():
+    app = gfhttpva.create_app(CacheConfig)
+    assert pvaapi.cache.maxsize == 10
+    client = app.test_client()
+    query = {
+              "range": {
+                "from": "2018-01-01T00:00:00.000Z",
+                "to": "2018-01-01T06:00:00.000Z",
+              },
+              "targets": [{"target": "long", "refId": "A",
+                           "type": "timeserie"}],
+              "jsonData": {
+                 "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                 "entity_label": "entity",
+                 "start_label": "starttime",
+                 "end_label": "endtime",
+                 "nturi_style": False
+              }
+            }
+    rv1 = client.post("/query", json=query)
+    rv2 = client.post("/query", json=query)
+    assert rv1.get_json() == rv2.get_json()
+    assert pvaapi.cache.hits == 1
+    assert pvaapi.cache.misses == 1
+
+
+def shared_cache(path):
+    return ResultCache(2, 10, shared=DiskCache(str(path), 1 << 20))
+
+
+def test_shared_cache(tmp_path):
+    result = {"labels": ["time", "value"],
+              "value": {"column0": np.arange(3, dtype=np.int64),
+                        "column1": np.array([1.5, 2.5, 3.5])},
+              "count": np.int32(3)}
+    shared_cache(tmp_path).put(key("a"), "CH", result)
+
+    cache = shared_cache(tmp_path)
+    res = cache.get(key("a"))
+    assert res["labels"] == ["time", "value"]
+    assert res["value"]["column0"].tolist() == [0, 1, 2]
+    assert res["value"]["column1"].tolist() == [1.5, 2.5, 3.5]
+    assert type(res["value"]["column1"]) is np.ndarray
+    assert not res["value"]["column1"].flags.writeable
+    assert res["count"] == 3
+    assert cache.hits == 1
+    assert cache.get(key("a")) is res
+    assert cache.get(key("b")) is None
+
+
+def test_shared_cache_ttl(tmp_path):
+    cache = ResultCache(0, 0.01, shared=DiskCache(str(tmp_path), 1 << 20))
+    cache.put(key("a"), "CH", {"value": np.arange(3)})
+    assert cache.get(key("a")) is not None
+    time.sleep(0.02)
+    assert cache.get(key("a")) is None
+    assert len(cache.shared) == 0
+
+
+def test_shared_cache_object_array(tmp_path):
+    shared_cache(tmp_path).put(key("a"), "CH",
+                               {"value": np.array([1, "a"], dtype=object)})
+    assert shared_cache(tmp_path).get(key("a")) is None
+
+
+def test_shared_cache_process(tmp_path):
+    shared_cache(tmp_path).put(key("a"), "CH", {"value": np.arange(3)})
+    code = ("import sys; "
+            "from tests.test_cache import key, shared_cache; "
+            "print(shared_cache(sys.argv[1]).get(key('a'))['value'].tolist())")
+    root = os.path.join(os.path.dirname(__file__), "..")
+    out = subprocess.check_output([sys.executable, "-c", code,
+                                   str(tmp_path)], cwd=root)
+    assert out.strip() == b"[0, 1, 2]"
@@ -0,0 +1,94 @@
+import threading
+import time
+
+from .context import clientpool
+from .context import metrics
+
+
+class Client(object):
+    def __init__(self, name):
+        self.name = name
+
+
+def test_checkout_reuse():
+    pool = clientpool.ClientPool(factory=Client)
+    client = pool.checkout("a")
+    pool.checkin("a", client)
+    assert pool.checkout("a") is client
+    assert pool.checkout("a") is not client
+    assert pool.size("a") == 2
+
+
+def test_per_channel_limit():
+    pool = clientpool.ClientPool(per_channel=1, factory=Client)
+    client = pool.checkout("a")
+    assert pool.checkout("a", timeout=0.01) is None
+    assert pool.checkout("b", timeout=0.01) is not None
+
+    threading.Timer(0.05, pool.checkin, ("a", client)).start()
+    assert pool.checkout("a", timeout=1) is client
+
+
+def test_lru_eviction():
+    pool = clientpool.ClientPool(maxsize=2, factory=Client)
+    for name in ("a", "b"):
+        pool.checkin(name, pool.checkout(name))
+    in_use = pool.checkout("a")
+
+    pool.checkin("c", pool.checkout("c"))
+    assert len(pool) == 2
+    assert pool.size("b") == 0
+
+    pool.checkin("a", in_use)
+    assert pool.checkout("a") is in_use
+
+
+def test_idle_timeout():
+    pool = clientpool.ClientPool(idle_timeout=0.05, factory=Client)
+    client = pool.checkout("a")
+    pool.checkin("a", client)
+    time.sleep(0.1)
+    assert pool.checkout("a") is not client
+    assert pool.size("a") == 1
+
+
+def test_discard():
+    pool = clientpool.ClientPool(per_channel=1, factory=Client)
+    client = pool.checkout("a")
+    pool.discard("a", client)
+    assert pool.checkout("a", timeout=0.01) is not client
+
+
+def test_slow_factory_other_channel():
+    started = threading.Event()
+    release = threading.Event()
+
+    def factory(name):
+        if name == "slow":
+            started.set()
+            release.wait(5)
+        return Client(name)
+
+    pool = clientpool.ClientPool(factory=factory)
+    thread = threading.Thread(target=pool.checkout, args=("slow",))
+    thread.start()
+    started.wait(5)
+    try:
+        start = time.monotonic()
+        pool.checkout("fast")
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        thread.join()
+
+
+def test_label_and_eviction_metrics():
+    pool = clientpool.ClientPool(maxsize=1, factory=Client)
+    assert pool.label("metrics-a") == "other"
+    pool.checkin("metrics-a", pool.checkout("metrics-a"))
+    assert pool.label("metrics-a") == "metrics-a"
+    assert metrics.RPC_CLIENTS.get(("metrics-a",)) == 1
+
+    pool.checkin("metrics-b", pool.checkout("metrics-b"))
+    assert pool.label("metrics-a") == "other"
+    assert 'ch="metrics-a"' not in metrics.render()
@@ -0,0 +1,100 @@
+import gzip
+
+import pytest
+
+from .context import compress
+
+
+@pytest.fixture
+def query():
+    return {
+             "range": {
+               "from": "2018-01-01T00:00:00.000Z",
+               "to": "2018-01-01T06:00:00.000Z",
+             },
+             "targets": [{"target": "long", "refId": "A",
+                          "type": "timeserie"}],
+             "jsonData": {
+                "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                "entity_label": "entity",
+                "start_label": "starttime",
+                "end_label": "endtime",
+                "nturi_style": False
+             }
+           }
+
+
+def test_choose_encoding():
+    encodings = ["br", "gzip"]
+    assert compress.choose_encoding("gzip, deflate, br", encodings) == "br"
+    assert compress.choose_encoding("gzip, br;q=0", encodings) == "gzip"
+    assert compress.choose_encoding("deflate", encodings) is None
+    assert compress.choose_encoding("*", ["gzip"]) == "gzip"
+    assert compress.choose_encoding("*, gzip;q=0", ["gzip"]) is None
+    assert compress.choose_encoding(None, encodings) is None
+
+
+def test_compress_gzip():
+    data = b"[1,2,3]" * 100
+    res = compress.compress(data, "gzip", 6)
+    assert gzip.decompress(res) == data
+    assert res == compress.compress(data, "gzip", 6)
+
+    stream = compress.compress_stream(["[1,2,3]"] * 100, "gzip", 6)
+    assert gzip.decompress(b"".join(stream)) == data
+
+
+@pytest.mark.skipif(not compress.available("br"),
+                    reason="brotli is not installed")
+def test_compress_brotli():
+    import brotli
+
+    data = b"[1,2,3]" * 100
+    assert brotli.decompress(compress.compress(data, "br", 4)) == data
+    stream = compress.compress_stream(["[1,2,3]"] * 100, "br", 4)
+    assert brotli.decompress(b"".join(stream)) == data
+
+
+def test_payload_cache():
+    cache = compress.PayloadCache(maxbytes=1000)
+    data = b"[1,2,3]" * 100
+    res = cache.compress(data, "gzip", 6)
+    assert cache.compress(data, "gzip", 6) is res
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.compress(b"[4,5,6]" * 100, "gzip", 6)
+    assert len(cache) == 2
+
+    cache.maxbytes = 0
+    assert cache.compress(data, "gzip", 6) is not res
+
+
+def test_query_gzip(app, query):
+    app.config["COMPRESS_ENCODINGS"] = ["gzip"]
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    client = app.test_client()
+    expected = client.post("/query", json=query)
+    rv = client.post("/query", json=query,
+                     headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in expected.headers
+    assert rv.headers["Content-Encoding"] == "gzip"
+    assert rv.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(rv.get_data()) == expected.get_data()
+    assert rv.headers["ETag"] == expected.headers["ETag"][:-1] + '-gzip"'
+
+    app.config["COMPRESS_MIN_SIZE"] = 1 << 20
+    rv = client.post("/query", json=query,
+                     headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in rv.headers
+
+
+def test_query_table_stream_gzip(app, query):
+    app.config["COMPRESS_ENCODINGS"] = ["gzip"]
+    app.config["TABLE_STREAM_BATCH"] = 2
+    client = app.test_client()
+    query["targets"] = [{"target": "table", "refId": "A", "type": "table"}]
+    expected = client.post("/query", json=query)
+    rv = client.post("/query", json=query,
+                     headers={"Accept-Encoding": "gzip"})
+    assert rv.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(rv.get_data()) == expected.get_data()
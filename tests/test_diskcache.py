@@ -0,0 +1,158 @@
+import os
+import time
+
+import numpy as np
+
+from .context import config, diskcache, gfhttpva, pvaapi
+from gfhttpva.segment import SegmentStore
+
+
+def test_disk_cache_put_get(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path), 1 << 20)
+    time_ms = np.array([0, 10, 20], dtype=np.int64)
+    value = np.array([1.5, 2.5, 3.5])
+    assert cache.put(("a",), 0, 20, [time_ms, value], {"n": 1}) == 1
+    assert cache.put(("a",), 30, 40, [time_ms[:0], value[:0]]) == 2
+
+    entries = diskcache.DiskCache(str(tmp_path), 1 << 20).get(("a",))
+    assert [(start, end) for start, end, _, _ in entries] == [(0, 20),
+                                                              (30, 40)]
+    _, _, arrays, meta = entries[0]
+    assert isinstance(arrays[0], np.memmap)
+    assert arrays[0].tolist() == [0, 10, 20]
+    assert arrays[1].tolist() == [1.5, 2.5, 3.5]
+    assert meta["n"] == 1
+    assert len(entries[1][2][0]) == 0
+    assert cache.get(("b",)) == []
+
+
+def test_disk_cache_strings(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path), 1 << 20)
+    columns = [np.array(["foo", "barbaz"]), [1, 2], [u"温度", "x" * 2000],
+               [b"a", b""]]
+    assert cache.put(("a",), 0, 10, columns) == 1
+    arrays = cache.get(("a",))[0][2]
+    assert arrays[0] == ["foo", "barbaz"]
+    assert arrays[1].tolist() == [1, 2]
+    assert arrays[2] == [u"温度", "x" * 2000]
+    assert arrays[3] == [b"a", b""]
+    # long strings are not padded to fixed width
+    assert sum(cache._files.values()) < 4000
+    assert cache.put(("b",), 0, 10, [np.array([1, "a"], dtype=object)]) == 0
+    assert cache.get(("b",)) == []
+
+
+def test_disk_cache_too_large(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path), 3000)
+    cache.put(("a",), 0, 10, [np.zeros(10)])
+    assert cache.put(("b",), 0, 10, [np.zeros(1000)]) == 0
+    assert cache.put(("c",), 0, 10, [["x" * 4000]]) == 0
+    assert len(cache.get(("a",))) == 1
+    assert len(cache) == 1
+
+
+def test_disk_cache_evict(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path), 3000)
+    value = np.zeros(100)
+    for i in range(5):
+        cache.put((i,), 0, 10, [value])
+    assert len(cache) == 2
+    assert cache.get((0,)) == []
+    assert len(cache.get((4,))) == 1
+
+
+def test_disk_cache_replace(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path), 1 << 20)
+    cache.put(("a",), 0, 10, [np.array([1])])
+    cache.put(("a",), 10, 20, [np.array([2])])
+    cache.replace(("a",), [(0, 20, [np.array([1, 2])])])
+    entries = cache.get(("a",))
+    assert len(entries) == 1
+    assert entries[0][2][0].tolist() == [1, 2]
+    assert len(cache) == 1
+
+
+def test_disk_cache_closed():
+    cache = diskcache.DiskCache(lag=10)
+    now = time.time() * 1000
+    assert cache.closed(now - 20000)
+    assert not cache.closed(now)
+    assert not cache.enabled()
+
+
+def test_segment_store_disk(tmp_path):
+    disk = diskcache.DiskCache(str(tmp_path), 1 << 20)
+    store = SegmentStore(10, disk=disk, max_files=2)
+    for i in range(3):
+        store.add("a", i * 10, i * 10 + 10, np.array([i * 10 + 5]),
+                  np.array([i]))
+    assert len(disk) == 1
+
+    store = SegmentStore(10, disk=disk)
+    assert store.missing("a", 0, 40) == [(30, 40)]
+    time_ms, value = store.get("a", 0, 30)
+    assert time_ms.tolist() == [5, 15, 25]
+    assert value.tolist() == [0, 1, 2]
+
+
+def test_query_disk_cache(tmp_path):
+    class DiskConfig(config.TestingConfig):
+        PVA_SEGMENT_SIZE = 10
+        PVA_CACHE_SIZE = 10
+        PVA_DISK_CACHE_PATH = str(tmp_path)
+
+    query = {
+              "range": {
+                "from": "2018-01-01T00:00:00.000Z",
+                "to": "2018-01-01T06:00:00.000Z",
+              },
+              "targets": [{"target": "long", "refId": "A",
+                           "type": "timeserie"}],
+              "jsonData": {
+                 "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                 "entity_label": "entity",
+                 "start_label": "starttime",
+                 "end_label": "endtime",
+                 "nturi_style": False
+              }
+            }
+
+    client = gfhttpva.create_app(DiskConfig).test_client()
+    expected_series = client.post("/query", json=query).get_data()
+    query["targets"] = [{"target": "table", "refId": "B", "type": "table"}]
+    expected_table = client.post("/query", json=query).get_data()
+    assert pvaapi.cache.misses == 2
+
+    # restarted app serves closed ranges without RPC
+    client = gfhttpva.create_app(DiskConfig).test_client()
+    assert client.post("/query", json=query).get_data() == expected_table
+    query["targets"] = [{"target": "long", "refId": "A",
+                         "type": "timeserie"}]
+    assert client.post("/query", json=query).get_data() == expected_series
+    assert pvaapi.cache.misses == 0
+
+
+def test_disk_cache_tmp_files(tmp_path):
+    old = tmp_path / "old.tmp"
+    new = tmp_path / "new.tmp"
+    old.write_bytes(b"x")
+    new.write_bytes(b"x")
+    expired = time.time() - diskcache.TMP_EXPIRE - 1
+    os.utime(str(old), (expired, expired))
+
+    diskcache.DiskCache(str(tmp_path), 1 << 20)
+    # temporary files being written by other processes are kept
+    assert not old.exists()
+    assert new.exists()
+
+
+def test_disk_cache_shared_size(tmp_path):
+    caches = [diskcache.DiskCache(str(tmp_path), 4000) for _ in range(3)]
+    value = np.zeros(100)
+    for i in range(30):
+        caches[i % 3].put((i,), 0, 10, [value])
+
+    size = sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(str(tmp_path))
+               for name in names)
+    assert size <= 4000 * (1 + 3 * diskcache.DiskCache.rescan_ratio)
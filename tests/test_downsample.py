@@ -0,0 +1,134 @@
+import numpy as np
+
+from .context import gfhttpva
+from .context import config
+from .context import pvaapi
+from gfhttpva.downsample import aggregate, lttb, minmax, downsample
+
+
+class DownsampleConfig(config.TestingConfig):
+    PVA_DOWNSAMPLE = "lttb"
+
+
+class DownsampleErrorConfig(config.TestingConfig):
+    PVA_DOWNSAMPLE = "error"
+
+
+def test_lttb():
+    time = np.arange(1000) * 1000
+    value = np.sin(np.arange(1000) / 50.)
+    indices = lttb(time, value, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert len(lttb(time, value, 2000)) == 1000
+
+
+def test_minmax():
+    time = np.arange(10)
+    value = np.array([3, 1, 2, 9, 5, 0, 4, 4, 8, 7])
+    indices = minmax(time, value, 4)
+    assert indices.tolist() == [1, 3, 5, 8]
+
+
+def test_downsample_not_number():
+    time = np.arange(10)
+    value = np.array([str(i) for i in range(10)])
+    res_time, res_value = downsample("lttb", time, value, 3)
+    assert res_value.tolist() == value.tolist()
+
+
+def test_set_downsample():
+    gfhttpva.create_app(DownsampleConfig)
+    assert pvaapi.downsample == "lttb"
+    gfhttpva.create_app(DownsampleErrorConfig)
+    assert pvaapi.downsample is None
+
+
+def test_query_downsample():
+    app = gfhttpva.create_app(DownsampleConfig)
+    client = app.test_client()
+    query = {
+              "range": {
+                "from": "2018-01-01T00:00:00.000Z",
+                "to": "2018-01-01T06:00:00.000Z",
+              },
+              "targets": [{"target": "long", "refId": "A",
+                           "type": "timeserie"}],
+              "maxDataPoints": 2,
+              "jsonData": {
+                 "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                 "entity_label": "entity",
+                 "start_label": "starttime",
+                 "end_label": "endtime",
+                 "nturi_style": False
+              }
+            }
+    rv = client.post("/query", json=query)
+    json_data = rv.get_json()
+    res = [
+            {
+              "target": "long",
+              "datapoints": [
+                [0, 1514764800000],
+                [2, 1514786400000]
+              ],
+            }
+          ]
+    assert json_data == res
+
+
+def test_aggregate():
+    time = np.array([0, 5, 10, 12, 35], dtype=np.int64)
+    value = np.array([1, 3, 2, 6, 4])
+    expected = {"mean": [2.0, 4.0, 4.0], "min": [1, 2, 4],
+                "max": [3, 6, 4], "last": [3, 6, 4], "count": [2, 2, 1]}
+    for func, res in expected.items():
+        t, v = aggregate(func, time, value, 10)
+        assert t.tolist() == [0, 10, 30]
+        assert v.tolist() == res
+
+    strings = np.array(["a", "b", "c", "d", "e"])
+    assert aggregate("mean", time, strings, 10)[1] is strings
+    assert aggregate("last", time, strings, 10)[1].tolist() == ["b", "d",
+                                                                 "e"]
+    t, v = aggregate("mean", time[:0], value[:0], 10)
+    assert len(t) == 0
+
+
+def test_query_aggregation(client):
+    query = {
+              "range": {
+                "from": "2018-01-01T00:00:00.000Z",
+                "to": "2018-01-01T06:00:00.000Z",
+              },
+              "targets": [{"target": "long", "refId": "A",
+                           "type": "timeserie", "aggregation": "mean"}],
+              "intervalMs": 21600000,
+              "jsonData": {
+                 "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                 "entity_label": "entity",
+                 "start_label": "starttime",
+                 "end_label": "endtime",
+                 "nturi_style": False
+              }
+            }
+    rv = client.post("/query", json=query)
+    assert rv.get_json() == [{"target": "long",
+                              "datapoints": [[0.5, 1514764800000],
+                                             [2.0, 1514786400000]]}]
+
+    query["targets"][0]["aggregation"] = "median"
+    rv = client.post("/query", json=query)
+    assert rv.status_code == 400
+    assert rv.get_json()["message"] == "Invalid aggregation"
+
+    # intervals shorter than the time resolution are 1 ms
+    query["targets"][0]["aggregation"] = "count"
+    query["intervalMs"] = 0.5
+    rv = client.post("/query", json=query)
+    assert rv.get_json() == [{"target": "long",
+                              "datapoints": [[1, 1514764800000],
+                                             [1, 1514775600000],
+                                             [1, 1514786400000]]}]
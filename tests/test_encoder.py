@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from .context import gfhttpva
+from .context import config
+from gfhttpva.encoder import JSONProvider, RawJSON
+
+
+class StdlibEncoderConfig(config.TestingConfig):
+    JSON_FAST_ENCODER = False
+
+
+@pytest.fixture
+def payloads():
+    return [
+             [{"target": "long",
+               "datapoints": np.array([[0, 1514764800000],
+                                       [1, 1514775600000]])}],
+             [{"target": "float",
+               "datapoints": np.array([[0.5, 1514764800000],
+                                       [1e-5, 1514775600000],
+                                       [1e20, 1514786400000]])}],
+             [{"target": "nan",
+               "datapoints": np.array([[np.nan, 1514764800000]])}],
+             [{"target": "string",
+               "datapoints": [("2", 1514764800000), ("3", 1514775600000)]}],
+             [{"columns": [{"text": "value"}, {"text": u"温度"}],
+               "rows": [(1.1, 1460589140), (2.0, 1460589142)],
+               "type": "table"}],
+             {"b": np.int64(1), "a": np.float64(0.25), "c": None},
+             [{"target": "\x7f", "datapoints": []}],
+           ]
+
+
+def test_encoder_identical(app, payloads):
+    app.json.fast = True
+    fast = [app.json.response(payload).data for payload in payloads]
+    app.json.fast = False
+    stdlib = [app.json.response(payload).data for payload in payloads]
+    assert fast == stdlib
+
+
+def test_encoder_numpy(app):
+    app.json.fast = False
+    rv = app.json.response(np.array([[1, 2], [3, 4]]))
+    assert rv.data == b"[[1,2],[3,4]]\n"
+
+
+def test_set_fast_encoder():
+    app = gfhttpva.create_app("gfhttpva.config.TestingConfig")
+    assert isinstance(app.json, JSONProvider)
+    assert app.json.fast
+    app = gfhttpva.create_app(StdlibEncoderConfig)
+    assert not app.json.fast
+
+
+def test_raw_json(app):
+    raw = RawJSON('[{"a":1,"b":"\\u6e29"}]')
+    assert app.json.response(raw).data == raw.encode() + b"\n"
+    assert app.json.dumps(raw, indent=2) == app.json.dumps(
+        [{"a": 1, "b": u"温"}], indent=2)
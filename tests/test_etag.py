@@ -0,0 +1,148 @@
+import time
+
+import pytest
+
+from .context import etag, pvaapi
+
+
+@pytest.fixture
+def query():
+    return {
+             "requestId": "Q100",
+             "range": {
+               "from": "2018-01-01T00:00:00.000Z",
+               "to": "2018-01-01T06:00:00.000Z",
+               "raw": {"from": "now-6h", "to": "now"}
+             },
+             "targets": [{"target": "long", "refId": "A",
+                          "type": "timeserie"}],
+             "jsonData": {
+                "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                "entity_label": "entity",
+                "start_label": "starttime",
+                "end_label": "endtime",
+                "nturi_style": False
+             }
+           }
+
+
+def test_request_key(query):
+    key = etag.request_key("/query", query)
+    query["requestId"] = "Q101"
+    query["range"]["raw"] = {"from": "now-7h", "to": "now"}
+    assert etag.request_key("/query", query) == key
+    assert etag.request_key("/annotations", query) != key
+    query["range"]["to"] = "2018-01-01T07:00:00.000Z"
+    assert etag.request_key("/query", query) != key
+
+
+def test_matches():
+    assert etag.matches('"abc"', "abc")
+    assert etag.matches('W/"abc"', "abc")
+    assert etag.matches('"xyz", "abc-gzip"', "abc")
+    assert etag.matches("*", "abc")
+    assert not etag.matches('"abcd"', "abc")
+    assert not etag.matches(None, "abc")
+
+
+def test_range_end(query):
+    assert etag.range_end(query) == 1514786400
+    assert etag.range_end({}) is None
+    assert etag.range_end({"range": {"to": "now"}}) is None
+
+
+def test_etag_store():
+    store = etag.ETagStore(maxsize=2, lag=10)
+    store.put("a", "tag", time.time() - 60)
+    assert store.get("a") == ("tag", 0)
+
+    store.put("b", "tag", time.time())
+    store.put("c", "tag", None)
+    assert store.get("b") is None
+    assert store.get("c") is None
+
+    store.put("b", "tag", 0)
+    store.put("c", "tag", 0)
+    assert len(store) == 2
+    assert store.get("a") is None
+
+    store.maxsize = 0
+    assert store.get("b") is None
+
+
+def test_query_not_modified(app, query, monkeypatch):
+    client = app.test_client()
+    rv = client.post("/query", json=query)
+    tag = rv.headers["ETag"]
+    assert rv.status_code == 200
+
+    def invoke(*args):
+        raise AssertionError("RPC must not be called")
+
+    monkeypatch.setattr(pvaapi, "_invoke", invoke)
+    query["requestId"] = "Q101"
+    rv = client.post("/query", json=query, headers={"If-None-Match": tag})
+    assert rv.status_code == 304
+    assert rv.headers["ETag"] == tag
+    assert rv.get_data() == b""
+    assert etag.ETAGS.hits == 1
+
+
+def test_query_open_range(app, query):
+    now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+    query["range"]["to"] = now
+    client = app.test_client()
+    rv = client.post("/query", json=query)
+    tag = rv.headers["ETag"]
+    assert len(etag.ETAGS) == 0
+
+    rv = client.post("/query", json=query, headers={"If-None-Match": tag})
+    assert rv.status_code == 304
+    assert etag.ETAGS.hits == 0
+
+    rv = client.post("/query", json=query,
+                     headers={"If-None-Match": '"other"'})
+    assert rv.status_code == 200
+
+
+def test_annotations_etag(app):
+    annotation = {
+        "range": {"from": "2018-01-01T00:00:00.000Z",
+                  "to": "2018-01-01T06:00:00.000Z"},
+        "annotation": {"entity": "test", "name": "test"},
+        "jsonData": {"ch": "ET_SASAKI:GFHTTPVA:TEST:annotation",
+                     "entity_label": "entity",
+                     "start_label": "starttime",
+                     "end_label": "endtime",
+                     "nturi_style": False}
+    }
+    client = app.test_client()
+    rv = client.post("/annotations", json=annotation)
+    tag = rv.headers["ETag"]
+    rv = client.post("/annotations", json=annotation,
+                     headers={"If-None-Match": tag})
+    assert rv.status_code == 304
+
+
+def test_etag_disabled(app, query):
+    app.config["ETAG"] = False
+    rv = app.test_client().post("/query", json=query)
+    assert "ETag" not in rv.headers
+
+
+def test_not_modified_encoded_tag(app, query):
+    app.config["COMPRESS_ENCODINGS"] = ["gzip"]
+    app.config["COMPRESS_MIN_SIZE"] = 0
+    client = app.test_client()
+    headers = {"Accept-Encoding": "gzip"}
+    rv = client.post("/query", json=query, headers=headers)
+    tag = rv.headers["ETag"]
+    assert tag.endswith('-gzip"')
+
+    # 304 from the store and from the response have the same tag
+    headers["If-None-Match"] = tag
+    for i in range(2):
+        rv = client.post("/query", json=query, headers=headers)
+        assert rv.status_code == 304
+        assert rv.headers["ETag"] == tag
+        etag.ETAGS.clear()
@@ -72,6 +72,14 @@ def test_query_timeserie(client, query):
     assert json_data == res
 
 
+def test_query_float_time(client, query):
+    query["targets"] = [{"target": "float", "refId": "B",
+                         "type": "timeserie", "params": {"param1": "1"}}]
+    rv = client.post("/query", json=query)
+    # time of float values is serialized as integer
+    assert b"[1.0,1514764800000]" in rv.get_data()
+
+
 def test_query_timeserie_error(client, query):
     query["targets"] = [
                         {"target": "error", "refId": "A",
@@ -116,6 +124,18 @@ def test_query_table(client, query):
     assert json_data == res
 
 
+def test_query_table_stream(app, query):
+    app.config["TABLE_STREAM_BATCH"] = 2
+    client = app.test_client()
+    query["targets"] = [{"target": "table", "refId": "A", "type": "table"}]
+    rv = client.post("/query", json=query)
+
+    app.config["TABLE_STREAM_BATCH"] = 0
+    expected = app.test_client().post("/query", json=query)
+    assert rv.get_data() == expected.get_data()
+    assert len(rv.get_json()[0]["rows"]) == 3
+
+
 def test_query_table_error(client, query):
     query["targets"] = [
                         {"target": "error", "refId": "A",
@@ -137,6 +157,16 @@ def test_query_invalid_time(client, query):
     assert json_data == res
 
 
+def test_query_invalid_max_points(client, query):
+    query["maxDataPoints"] = "abc"
+    rv = client.post("/query", json=query)
+    assert rv.status_code == 400
+    json_data = rv.get_json()
+    res = {'message': 'Invalid maxDataPoints'}
+    res["details"] = {"maxDataPoints": "abc"}
+    assert json_data == res
+
+
 def test_query_invalid_query_target(client, query):
     del query["targets"]
     rv = client.post("/query", json=query)
@@ -267,3 +297,29 @@ def test_query_nturi_style(client, query):
             },
           ]
     assert json_data == res
+
+
+def test_query_timeserie_order(client, query):
+    entities = ["float", "long", "string", "long", "float", "string"]
+    query["targets"] = [{"target": entity, "refId": str(i),
+                         "type": "timeserie"}
+                        for i, entity in enumerate(entities)]
+    rv = client.post("/query", json=query)
+    json_data = rv.get_json()
+    assert [data["target"] for data in json_data] == entities
+
+
+def test_query_first_error(client, query):
+    query["targets"] = [
+                        {"target": "long", "refId": "A",
+                         "type": "timeserie"},
+                        {"target": "error", "refId": "B",
+                         "type": "timeserie"},
+                        {"target": "float", "refId": "C"},
+                       ]
+    rv = client.post("/query", json=query)
+    json_data = rv.get_json()
+    res = {'message': 'RPC return has no requested key'}
+    res["details"] = {'RPC return': "{'value': 1000}",
+                      'request key': 'value'}
+    assert json_data == res
@@ -0,0 +1,61 @@
+from .context import metrics
+
+
+def test_counter_render():
+    counter = metrics.Counter("test_total", "test counter", ("ch",))
+    counter.inc(("a",))
+    counter.inc(("a",), 2)
+    counter.inc(('b"\\',))
+
+    assert counter.get(("a",)) == 3
+    assert counter.render() == ["# HELP test_total test counter",
+                                "# TYPE test_total counter",
+                                'test_total{ch="a"} 3',
+                                'test_total{ch="b\\"\\\\"} 1']
+
+
+def test_histogram_render():
+    histogram = metrics.Histogram("test_seconds", "test histogram",
+                                  buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    assert histogram.get_count() == 3
+    assert histogram.render() == ["# HELP test_seconds test histogram",
+                                  "# TYPE test_seconds histogram",
+                                  'test_seconds_bucket{le="0.1"} 1',
+                                  'test_seconds_bucket{le="1"} 2',
+                                  'test_seconds_bucket{le="+Inf"} 3',
+                                  "test_seconds_sum 5.55",
+                                  "test_seconds_count 3"]
+
+
+def test_metrics_endpoint(client):
+    ch = "ET_SASAKI:GFHTTPVA:TEST:search"
+    query = {"ch": ch, "target": "", "name": "entity", "nturi_style": False}
+
+    requests = metrics.REQUESTS.get(("/search", 200))
+    rpc_count = metrics.RPC_LATENCY.get_count((ch,))
+    client.post("/search", json=query)
+    assert metrics.REQUESTS.get(("/search", 200)) == requests + 1
+    assert metrics.RPC_LATENCY.get_count((ch,)) == rpc_count + 1
+    assert metrics.RPC_CLIENTS.get((ch,)) >= 1
+
+    rv = client.get("/metrics")
+    assert rv.status_code == 200
+    assert rv.content_type.startswith("text/plain; version=0.0.4")
+    text = rv.get_data(as_text=True)
+    assert ('gfhttpva_requests_total{route="/search",status="200"}'
+            in text)
+    assert 'gfhttpva_rpc_duration_seconds_count{ch="%s"}' % ch in text
+    assert "# TYPE gfhttpva_serialize_duration_seconds histogram" in text
+
+
+def test_remove_channel():
+    metrics.RPC_ERRORS.inc(("removed",))
+    metrics.RPC_LATENCY.observe(0.1, ("removed",))
+    metrics.remove_channel("removed")
+    assert metrics.RPC_ERRORS.get(("removed",)) == 0
+    assert metrics.RPC_LATENCY.get_count(("removed",)) == 0
+    assert 'ch="removed"' not in metrics.render()
@@ -0,0 +1,112 @@
+import json
+import time
+import threading
+from datetime import datetime, timezone
+
+from .context import config, gfhttpva, metrics, prewarm, pvaapi
+
+
+JSON_DATA = {"ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+             "entity_label": "entity",
+             "start_label": "starttime",
+             "end_label": "endtime",
+             "nturi_style": False}
+
+DASHBOARD = {
+    "time": {"from": "2018-01-01T00:00:00.000Z",
+             "to": "2018-01-01T06:00:00.000Z"},
+    "panels": [
+        {"datasource": "pvaccess", "maxDataPoints": 100,
+         "targets": [{"target": "long", "refId": "A", "type": "timeserie"},
+                     {"target": "float", "refId": "B", "hide": True}]},
+        {"type": "row", "panels": [
+            {"datasource": {"type": "pvaccess", "uid": "abc"},
+             "targets": [{"target": "table", "refId": "A",
+                          "type": "table"}]}]},
+        {"datasource": "other", "targets": [{"target": "long"}]},
+    ],
+}
+
+
+def test_parse_time():
+    now = datetime(2018, 1, 1, 6, tzinfo=timezone.utc)
+    assert prewarm.parse_time("now", now) == "2018-01-01T06:00:00.000Z"
+    assert prewarm.parse_time("now-6h", now) == "2018-01-01T00:00:00.000Z"
+    assert prewarm.parse_time("now-1d", now) == "2017-12-31T06:00:00.000Z"
+    assert (prewarm.parse_time("2018-01-01T03:00:00.000Z", now) ==
+            "2018-01-01T03:00:00.000Z")
+    assert prewarm.parse_time("now/d", now) is None
+
+
+def test_dashboard_queries():
+    datasources = {"pvaccess": JSON_DATA, "abc": JSON_DATA}
+    requests = prewarm.dashboard_queries({"dashboard": DASHBOARD},
+                                         datasources)
+    assert [req["targets"][0]["target"] for req in requests] == ["long",
+                                                                 "table"]
+    assert requests[0]["range"] == DASHBOARD["time"]
+    assert requests[0]["maxDataPoints"] == 100
+    assert requests[0]["jsonData"] == JSON_DATA
+    assert "maxDataPoints" not in requests[1]
+
+
+def test_prewarmer_waits_idle(tmp_path):
+    with open(str(tmp_path / "dashboard.json"), "w") as f:
+        json.dump(DASHBOARD, f)
+    (tmp_path / "broken.json").write_text("{")
+
+    calls = []
+    prewarmer = prewarm.Prewarmer(calls.append, str(tmp_path),
+                                  datasources={"pvaccess": JSON_DATA})
+
+    metrics.IN_FLIGHT.inc()
+    thread = threading.Thread(target=prewarmer.run_once)
+    thread.start()
+    time.sleep(0.2)
+    assert calls == []
+    metrics.IN_FLIGHT.dec()
+    thread.join()
+    assert len(calls) == 1
+
+
+def test_prewarm_cache(tmp_path):
+    with open(str(tmp_path / "dashboard.json"), "w") as f:
+        json.dump(DASHBOARD, f)
+
+    class PrewarmConfig(config.TestingConfig):
+        PVA_CACHE_SIZE = 10
+        PVA_SEGMENT_SIZE = 10
+        PREWARM_PATH = str(tmp_path)
+        PREWARM_INTERVAL = 3600
+        PREWARM_DATASOURCES = {"pvaccess": JSON_DATA, "abc": JSON_DATA}
+
+    app = gfhttpva.create_app(PrewarmConfig)
+    prewarm.PREWARMER.stop()
+    with app.app_context():
+        assert prewarm.PREWARMER.run_once() == 2
+
+    misses = pvaapi.cache.misses
+    query = {"range": DASHBOARD["time"],
+             "targets": [{"target": "long", "refId": "A",
+                          "type": "timeserie"}],
+             "jsonData": JSON_DATA}
+    rv = app.test_client().post("/query", json=query)
+    assert rv.status_code == 200
+    assert pvaapi.cache.misses == misses
+
+
+def test_prewarm_requires_store(tmp_path):
+    class PrewarmConfig(config.TestingConfig):
+        PVA_CACHE_SIZE = 10
+        PREWARM_PATH = str(tmp_path)
+
+    gfhttpva.create_app(PrewarmConfig)
+    assert prewarm.PREWARMER.path is None
+    assert prewarm.PREWARMER._thread is None
+
+    class DiskConfig(PrewarmConfig):
+        PVA_DISK_CACHE_PATH = str(tmp_path / "disk")
+
+    gfhttpva.create_app(DiskConfig)
+    assert prewarm.PREWARMER.path is None
+    assert prewarm.PREWARMER._thread is None
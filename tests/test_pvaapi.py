@@ -1,6 +1,14 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
 from .context import gfhttpva
 from .context import config
 from .context import pvaapi
+from gfhttpva.exception import InvalidRequest
+from gfhttpva.pvaapi import annotations_json, _ints, _strs
 
 
 class PvaRpcTimeoutConfig(config.DefaultConfig):
@@ -10,3 +18,147 @@ class PvaRpcTimeoutConfig(config.DefaultConfig):
 def test_set_timeout():
     app = gfhttpva.create_app(PvaRpcTimeoutConfig)
     assert pvaapi.timeout == 3
+
+
+class PvaMaxWorkersConfig(config.DefaultConfig):
+    PVA_MAX_WORKERS = 2
+
+
+def test_set_max_workers():
+    app = gfhttpva.create_app(PvaMaxWorkersConfig)
+    assert pvaapi.max_workers == 2
+
+
+def test_timeseries_time_ms():
+    res = {"labels": ["value", "secondsPastEpoch", "nanoseconds"],
+           "value": {"column0": np.array([1.5, 2.5]),
+                     "column1": np.array([1514764800, 1514764801],
+                                         dtype=np.uint64),
+                     "column2": np.array([999999999, 1000000],
+                                         dtype=np.uint64)}}
+    time_ms, value = pvaapi._get_timeseries(res)
+    assert time_ms.dtype == np.int64
+    assert time_ms.tolist() == [1514764800999, 1514764801001]
+
+
+def test_request_template():
+    labels = {"entity": "entity", "start": "starttime", "end": "endtime"}
+    first = pvaapi._create_request("long", {"param1": 0}, "2018-01-01",
+                                   "2018-01-02", labels, "CH", True)
+    second = pvaapi._create_request("float", {"param1": 1}, "2018-01-03",
+                                    "2018-01-04", labels, "CH", True)
+
+    assert first["query"]["entity"] == "long"
+    assert second["query"]["entity"] == "float"
+    assert second["query"]["param1"] == "1"
+    assert second["path"] == "CH"
+
+    other = pvaapi._create_request("long", {}, "2018-01-01", "2018-01-02",
+                                   labels)
+    assert not other.hasField("param1")
+    assert other["entity"] == "long"
+
+
+def test_annotations_json(app):
+    time = np.array([1514764800000.5, 1514764801000])
+    title = ["title", u"温度", 'quote " 100%']
+    tags = ["a,b", "", u"タグ,\\,x"]
+    text = np.array(["text", "", "t"])
+    columns = (_ints(time), _strs(title), _strs(tags), _strs(text))
+    annotation = {"name": "ann", "enable": True}
+
+    raw = annotations_json(annotation, *columns)
+    expected = [{"annotation": str(annotation), "time": int(tm),
+                 "title": ti, "tags": tag.split(","), "text": tex}
+                for tm, ti, tag, tex in zip(time, title, tags, text)]
+    assert str(raw) == app.json.dumps(expected, separators=(",", ":"))
+
+
+class SplitConfig(config.TestingConfig):
+    PVA_SPLIT_WINDOW = 3 * 3600
+    PVA_MAX_WORKERS = 2
+    PVA_CACHE_SIZE = 100
+
+
+def test_split():
+    pvaapi.split_window = 10
+    try:
+        assert pvaapi._split(5000, 35000) == [(5000, 10000), (10000, 20000),
+                                              (20000, 30000),
+                                              (30000, 35000)]
+        assert pvaapi._split(5000, 15000) == [(5000, 15000)]
+        pvaapi.split_window = 0
+        assert pvaapi._split(0, 100000) == [(0, 100000)]
+    finally:
+        pvaapi.split_window = 0
+
+
+def test_query_split():
+    app = gfhttpva.create_app(SplitConfig)
+    query = {
+              "range": {
+                "from": "2018-01-01T00:00:00.000Z",
+                "to": "2018-01-01T06:00:00.000Z",
+              },
+              "targets": [{"target": "long", "refId": str(i),
+                           "type": "timeserie",
+                           "params": {"param1": str(i)}}
+                          for i in range(4)],
+              "jsonData": {
+                 "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                 "entity_label": "entity",
+                 "start_label": "starttime",
+                 "end_label": "endtime",
+                 "nturi_style": False
+              }
+            }
+    # more targets than workers do not wait for each other's windows
+    rv = app.test_client().post("/query", json=query)
+    json_data = rv.get_json()
+    assert len(json_data) == 4
+    assert json_data[0]["datapoints"] == [[0, 1514764800000],
+                                          [1, 1514770200000],
+                                          [2, 1514775600000],
+                                          [1, 1514781000000],
+                                          [2, 1514786400000]]
+    assert pvaapi.cache.misses == 8
+
+
+def test_results_cancel():
+    failed = Future()
+    failed.set_exception(ValueError("failed"))
+    pending = Future()
+    with pytest.raises(ValueError):
+        pvaapi.results([failed, pending])
+    # calls which have not started are not run for a failed request
+    assert pending.cancelled()
+
+
+def test_query_coalesced_wait(app, monkeypatch):
+    class Response(object):
+        def get(self):
+            return {"value": 1}
+
+    def invoke(ch_name, request):
+        # slower than timeout, as checkout and invoke may take timeout each
+        time.sleep(0.3)
+        return Response()
+
+    monkeypatch.setattr(pvaapi, "timeout", 0.2)
+    monkeypatch.setattr(pvaapi, "_invoke", invoke)
+    labels = {"entity": "entity", "start": "starttime", "end": "endtime"}
+    args = ("CH", "long", {}, "2018-01-01T00:00:00", "2018-01-01T01:00:00",
+            labels, False)
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(pvaapi._query, *args) for i in range(2)]
+        assert [future.result() for future in futures] == [{"value": 1}] * 2
+
+
+def test_ints():
+    assert _ints(np.array([1.0, 2.0])) == [1, 2]
+    assert _ints(np.array([1.5, -2.5])) == [1, -2]
+    assert _ints(["3", 4, 5.5]) == [3, 4, 5]
+    for values in (np.array([np.nan]), np.array([np.inf]), [float("inf")],
+                   ["a"], [None]):
+        with pytest.raises(InvalidRequest):
+            _ints(values)
@@ -0,0 +1,79 @@
+import logging
+
+from .context import config, create_app, metrics, reqlog
+
+
+class AsyncLogConfig(config.TestingConfig):
+    LOG_ASYNC = True
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_request_log_sampling():
+    logger = logging.getLogger("test.reqlog.sampling")
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+
+    log = reqlog.RequestLog(rate=0, route_rates={"/query": 1.0})
+    log.log(logger, "/search", "headers", {"target": "a"})
+    assert handler.messages == []
+
+    log.log(logger, "/query", "headers", {"target": "a"})
+    assert handler.messages == ["headers", "{'target': 'a'}"]
+
+
+def test_request_log_truncate():
+    logger = logging.getLogger("test.reqlog.truncate")
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+
+    log = reqlog.RequestLog(max_body=5)
+    log.log(logger, "/query", "headers", "x" * 10)
+    assert handler.messages[1] == "xxxxx... (10 chars)"
+
+
+def test_listener():
+    logger = logging.getLogger("test.reqlog.listener")
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+
+    reqlog.start_listener(logger, [handler])
+    logger.info("message %d", 1)
+    reqlog.stop_listener(logger)
+
+    assert handler.messages == ["message 1"]
+    assert logger.handlers == []
+
+
+def test_listener_full_queue():
+    logger = logging.getLogger("test.reqlog.full")
+    logger.setLevel(logging.INFO)
+    dropped = metrics.LOG_DROPPED.get()
+
+    handler = reqlog.DropQueueHandler(reqlog.Queue(1))
+    logger.addHandler(handler)
+    logger.info("message 1")
+    logger.info("message 2")
+    logger.removeHandler(handler)
+
+    assert handler.queue.qsize() == 1
+    assert metrics.LOG_DROPPED.get() == dropped + 1
+
+
+def test_app_async_log():
+    app = create_app(AsyncLogConfig)
+    assert any(isinstance(handler, reqlog.DropQueueHandler)
+               for handler in app.logger.handlers)
+
+    app = create_app("gfhttpva.config.TestingConfig")
+    assert not any(isinstance(handler, reqlog.DropQueueHandler)
+                   for handler in app.logger.handlers)
@@ -0,0 +1,71 @@
+from .context import config, gfhttpva, pvaapi, searchindex
+
+
+class SearchIndexConfig(config.TestingConfig):
+    PVA_SEARCH_INDEX = "prefix"
+
+
+def test_prefix():
+    values = ["long", "float", "string", "str", "lo"]
+    index = searchindex.SearchIndex(lambda ch, name, nturi: values,
+                                    "prefix", refresh=0)
+    assert index.search("CH", "", "entity", False) == values
+    assert index.search("CH", "lo", "entity", False) == ["long", "lo"]
+    assert index.search("CH", "str", "entity", False) == ["string", "str"]
+    assert index.search("CH", "x", "entity", False) == []
+
+
+def test_substring():
+    values = ["long", "float", "string"]
+    index = searchindex.SearchIndex(lambda ch, name, nturi: values,
+                                    "substring", refresh=0)
+    assert index.search("CH", "o", "entity", False) == ["long", "float"]
+
+
+def test_fetch_once():
+    calls = []
+
+    def fetch(ch_name, name, nturi):
+        calls.append((ch_name, name, nturi))
+        return ["a"]
+
+    index = searchindex.SearchIndex(fetch, "prefix", refresh=0)
+    index.search("CH", "", "entity", False)
+    index.search("CH", "a", "entity", False)
+    index.search("CH", "a", "other", False)
+    assert calls == [("CH", "entity", False), ("CH", "other", False)]
+
+
+def test_fetch_error():
+    def fetch(ch_name, name, nturi):
+        raise RuntimeError()
+
+    index = searchindex.SearchIndex(fetch, "prefix", refresh=0)
+    assert index.search("CH", "", "entity", False) is None
+
+
+def test_refresh():
+    values = [["a"]]
+    index = searchindex.SearchIndex(lambda ch, name, nturi: values[0],
+                                    "prefix", refresh=0)
+    index.search("CH", "", "entity", False)
+    values[0] = ["a", "b"]
+    index._refresh()
+    assert index.search("CH", "", "entity", False) == ["a", "b"]
+
+    index.expire = -1
+    index._refresh()
+    assert len(index) == 0
+
+
+def test_search_with_index():
+    app = gfhttpva.create_app(SearchIndexConfig)
+    client = app.test_client()
+    query = {"ch": "ET_SASAKI:GFHTTPVA:TEST:search", "target": "s",
+             "name": "entity", "nturi_style": False}
+    try:
+        rv = client.post("/search", json=query)
+        assert rv.get_json() == ["string", "str"]
+        assert len(pvaapi.search_index) == 1
+    finally:
+        pvaapi.search_index.stop()
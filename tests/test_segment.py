@@ -0,0 +1,147 @@
+import numpy as np
+
+from .context import gfhttpva
+from .context import config
+from .context import pvaapi
+from gfhttpva.segment import Segments, SegmentStore
+
+
+class SegmentConfig(config.TestingConfig):
+    PVA_SEGMENT_SIZE = 10
+    PVA_CACHE_SIZE = 10
+
+
+def test_segments_missing():
+    segments = Segments()
+    assert segments.missing(0, 100) == [(0, 100)]
+    segments.add(10, 20, 1000, np.array([10, 15]), np.array([1, 2]))
+    segments.add(50, 60, 1000, np.array([50, 60]), np.array([3, 4]))
+    assert segments.missing(0, 100) == [(0, 10), (20, 50), (60, 100)]
+    assert segments.missing(12, 55) == [(20, 50)]
+    assert segments.missing(12, 18) == []
+    segments.add(20, 50, 1000, np.array([30]), np.array([5]))
+    assert segments.intervals == [[10, 60]]
+
+
+def test_segments_add():
+    segments = Segments()
+    segments.add(0, 20, 1000, np.array([0, 10, 20]), np.array([1, 2, 3]))
+    segments.add(20, 40, 1000, np.array([20, 30, 40]), np.array([4, 5, 6]))
+    time, value = segments.get(10, 30)
+    assert time.tolist() == [10, 20, 30]
+    assert value.tolist() == [2, 4, 5]
+
+
+def test_segments_covered_end():
+    segments = Segments()
+    segments.add(0, 20, 15, np.array([0, 10, 20]), np.array([1, 2, 3]))
+    assert segments.missing(0, 20) == [(15, 20)]
+    segments.add(30, 40, 15, np.array([30]), np.array([4]))
+    assert segments.intervals == [[0, 15]]
+
+
+def test_segments_refetch():
+    segments = Segments()
+    time = np.arange(0, 11000, 1000)
+    segments.add(0, 10000, 5500, time, time)
+    # window of missing interval starts at the whole second
+    assert segments.missing(0, 20000) == [(5500, 20000)]
+    time = np.arange(5000, 21000, 1000)
+    segments.add(5500, 20000, 20000, time, time)
+    assert segments.get(0, 20000)[0].tolist() == list(range(0, 21000, 1000))
+    assert segments.intervals == [[0, 20000]]
+
+
+def test_segments_truncate():
+    segments = Segments()
+    segments.add(0, 40, 1000, np.array([0, 10, 20, 30, 40]),
+                 np.array([1, 2, 3, 4, 5]))
+    segments.truncate(3)
+    assert segments.time.tolist() == [20, 30, 40]
+    assert segments.intervals == [[21, 40]]
+
+
+def test_segment_store_lru():
+    store = SegmentStore(1)
+    store.add("a", 0, 10, np.array([0]), np.array([1]))
+    store.add("b", 0, 10, np.array([0]), np.array([2]))
+    assert store.get("a", 0, 10) is None
+    assert store.missing("a", 0, 10) == [(0, 10)]
+    assert store.missing("b", 0, 10) == []
+    assert len(store) == 1
+
+
+def test_query_segment():
+    app = gfhttpva.create_app(SegmentConfig)
+    client = app.test_client()
+    query = {
+              "range": {
+                "from": "2018-01-01T00:00:00.000Z",
+                "to": "2018-01-01T06:00:00.000Z",
+              },
+              "targets": [{"target": "long", "refId": "A",
+                           "type": "timeserie"}],
+              "jsonData": {
+                 "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                 "entity_label": "entity",
+                 "start_label": "starttime",
+                 "end_label": "endtime",
+                 "nturi_style": False
+              }
+            }
+    client.post("/query", json=query)
+
+    query["range"] = {"from": "2018-01-01T03:00:00.000Z",
+                      "to": "2018-01-01T09:00:00.000Z"}
+    rv = client.post("/query", json=query)
+    json_data = rv.get_json()
+    res = [
+            {
+              "target": "long",
+              "datapoints": [
+                [1, 1514775600000],
+                [0, 1514786400000],
+                [1, 1514791800000],
+                [2, 1514797200000]
+              ],
+            }
+          ]
+    assert json_data == res
+    # only the missing range after the first query is requested
+    assert pvaapi.cache.misses == 2
+
+
+def test_segment_store_truncated():
+    store = SegmentStore(10, 3)
+    assert store.add("a", 0, 40, np.array([0, 10, 20, 30, 40]),
+                     np.array([1, 2, 3, 4, 5])) is False
+    assert store.get("a", 0, 40, 40) is None
+    assert store.get("a", 21, 40, 40)[0].tolist() == [30, 40]
+    assert store.add("a", 50, 60, np.array([50]), np.array([6])) is True
+
+
+class TruncateConfig(SegmentConfig):
+    PVA_SEGMENT_POINTS = 2
+
+
+def test_query_segment_truncated():
+    app = gfhttpva.create_app(TruncateConfig)
+    client = app.test_client()
+    query = {
+              "range": {
+                "from": "2018-01-01T00:00:00.000Z",
+                "to": "2018-01-01T06:00:00.000Z",
+              },
+              "targets": [{"target": "long", "refId": "A",
+                           "type": "timeserie"}],
+              "jsonData": {
+                 "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                 "entity_label": "entity",
+                 "start_label": "starttime",
+                 "end_label": "endtime",
+                 "nturi_style": False
+              }
+            }
+    rv = client.post("/query", json=query)
+    # datapoints truncated from the store are fetched again
+    assert len(rv.get_json()[0]["datapoints"]) == 3
@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from gfhttpva.singleflight import SingleFlight
+
+
+def test_single_flight():
+    flights = SingleFlight()
+    calls = []
+
+    def func():
+        calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(flights.do, "key", func, 1)
+                   for i in range(4)]
+        results = [future.result() for future in futures]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert len(flights) == 0
+
+
+def test_single_flight_error():
+    flights = SingleFlight()
+
+    def func():
+        time.sleep(0.2)
+        raise ValueError("error")
+
+    with ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(flights.do, "key", func, 1)
+                   for i in range(2)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_single_flight_timeout():
+    flights = SingleFlight()
+
+    with ThreadPoolExecutor(1) as executor:
+        executor.submit(flights.do, "key", lambda: time.sleep(0.3))
+        time.sleep(0.05)
+        with pytest.raises(FutureTimeoutError):
+            flights.do("key", lambda: None, 0.01)
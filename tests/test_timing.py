@@ -0,0 +1,60 @@
+import pytest
+
+from .context import timing
+
+
+@pytest.fixture
+def query():
+    return {
+             "range": {
+               "from": "2018-01-01T00:00:00.000Z",
+               "to": "2018-01-01T06:00:00.000Z",
+             },
+             "targets": [{"target": "long", "refId": "A",
+                          "type": "timeserie"}],
+             "jsonData": {
+                "ch": "ET_SASAKI:GFHTTPVA:TEST:get",
+                "entity_label": "entity",
+                "start_label": "starttime",
+                "end_label": "endtime",
+                "nturi_style": False
+             }
+           }
+
+
+def test_timings():
+    token = timing.start()
+    try:
+        with timing.phase("rpc"):
+            pass
+        with timing.phase("rpc"):
+            pass
+        timing.current().add("decode", 0.0015)
+        names = [name for name, duration in timing.current().items()]
+        header = timing.current().header()
+    finally:
+        timing.stop(token)
+
+    assert timing.current() is None
+    assert names == ["rpc", "decode", "total"]
+    assert "decode;dur=1.5" in header
+
+
+def test_phase_without_timings():
+    with timing.phase("rpc"):
+        pass
+    assert timing.current() is None
+
+
+def test_server_timing_header(client, query):
+    rv = client.post("/query", json=query)
+    names = [item.split(";")[0]
+             for item in rv.headers["Server-Timing"].split(", ")]
+    assert names == ["parse", "time", "build", "rpc", "decode", "convert",
+                     "encode", "total"]
+
+
+def test_server_timing_disabled(app, query):
+    app.config["SERVER_TIMING"] = False
+    rv = app.test_client().post("/query", json=query)
+    assert "Server-Timing" not in rv.headers